@@ -0,0 +1,214 @@
+# benchmark_suite.py
+# ------------------
+# Times model construction and solving over a matrix of grid sizes,
+# species sets and cell shapes, and records the size of the resulting CNF.
+#
+# Usage (from the repository root):
+#   python Benchmarks/benchmark_suite.py                       # full matrix
+#   python Benchmarks/benchmark_suite.py --quick               # small smoke run
+#   python Benchmarks/benchmark_suite.py --output new.json --baseline old.json
+#
+# Each row of the output records the wall time of every stage together with the
+# number of clauses and variables after that stage, so two result files produced
+# by different versions of CrystalSAT can be compared with --baseline.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CrystalSAT import CrystalSAT
+
+
+# Species sets, from a handful of ions up to the whole periodic table with ions
+SPECIES = {
+    "few": [
+        ("Pb", 2, "XII"),
+        ("Ti", 4, "VI"),
+        ("O", -2, "II"),
+    ],
+    "some": [
+        "Li", "Fe", "C", "Ti", "O", "H",
+        ("Ca", 2, "VIII"),
+        ("Ru", 8, "IV"),
+    ],
+    "all": [],
+}
+
+# Cell shapes as (a, b, c, alpha, beta, gamma) for a cell with unit volume scale
+CELLS = {
+    "cubic": (1.0, 1.0, 1.0, 90.0, 90.0, 90.0),
+    "tetragonal": (1.0, 1.0, 1.4, 90.0, 90.0, 90.0),
+    "hexagonal": (1.0, 1.0, 1.6, 90.0, 90.0, 120.0),
+    "triclinic": (1.0, 1.1, 1.2, 80.0, 95.0, 105.0),
+}
+
+GRIDS = [4, 6, 8, 10, 12]
+
+# Cell edge (Å) per grid point, keeps the site spacing constant across grid sizes
+SPACING = 1.6
+
+
+def cnf_size(crystal):
+    """
+    Returns the number of clauses and variables currently held by a model.
+    :param crystal: CrystalSAT model
+    :return: (n_clauses, n_vars)
+    """
+    clauses = crystal.cnf.clauses
+    n_vars = max(crystal.cnf.nv, crystal.vpool.top, crystal.max_real)
+    return len(clauses), n_vars
+
+
+def estimate_exclusivity(n, k):
+    """
+    Estimates the number of site exclusivity clauses written by initialise().
+    Used to skip cases that would not fit in memory.
+    """
+    return n ** 3 * k * (k - 1) // 2
+
+
+def run_case(grid, species, cell, n_solutions, pack):
+    """
+    Runs one benchmark case and returns its row.
+    :param grid: number of grid points along each axis
+    :param species: key into SPECIES
+    :param cell: key into CELLS
+    :param n_solutions: number of solutions requested from solve_multiple
+    :param pack: passed to initialise()
+    :return: dict with timings and CNF sizes per stage
+    """
+    a, b, c, alpha, beta, gamma = CELLS[cell]
+    scale = SPACING * grid
+    row = {"grid": grid, "species": species, "cell": cell, "pack": pack, "stages": {}}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        n_clauses, n_vars = cnf_size(crystal)
+        row["stages"][name] = {"seconds": elapsed, "clauses": n_clauses, "vars": n_vars}
+        return result
+
+    start = time.perf_counter()
+    crystal = CrystalSAT(grid, grid, grid, a * scale, b * scale, c * scale,
+                         alpha, beta, gamma, list(SPECIES[species]))
+    n_clauses, n_vars = cnf_size(crystal)
+    row["stages"]["construct"] = {"seconds": time.perf_counter() - start, "clauses": n_clauses, "vars": n_vars}
+    row["k"] = crystal.k
+
+    stage("initialise", lambda: crystal.initialise(pack=pack))
+
+    first = crystal.lower
+    last = crystal.k - 1
+    n_sites = grid ** 3
+
+    stage("isolate", lambda: crystal.isolate(first, cutoff=SPACING * 1.5, tolerance=0.1))
+    stage("bound_atom", lambda: (crystal.bound_atom(first, 1, max(1, n_sites // 8)),
+                                 crystal.bound_atom(last, 1, max(1, n_sites // 4))))
+
+    solution = stage("solve", lambda: crystal.solve())
+    row["satisfiable"] = solution is not None
+
+    solutions = stage("solve_multiple", lambda: crystal.solve_multiple(n_solutions=n_solutions))
+    row["n_solutions"] = len(solutions)
+
+    return row
+
+
+def version_info():
+    """
+    Collects information that identifies the code and machine a result file came from.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(["git", "describe", "--always", "--dirty"], cwd=root,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def case_key(row):
+    return row["grid"], row["species"], row["cell"], row["pack"]
+
+
+def compare(rows, baseline_rows):
+    """
+    Prints the ratio of stage times and the change in CNF size against a baseline run.
+    """
+    baseline = {case_key(row): row for row in baseline_rows}
+    print("\nComparison against baseline (time ratio new/old, clause delta):")
+    for row in rows:
+        old = baseline.get(case_key(row))
+        if old is None or "stages" not in old or "stages" not in row:
+            continue
+        parts = []
+        for name, new_stage in row["stages"].items():
+            old_stage = old["stages"].get(name)
+            if old_stage is None:
+                continue
+            ratio = new_stage["seconds"] / old_stage["seconds"] if old_stage["seconds"] > 0 else float("inf")
+            delta = new_stage["clauses"] - old_stage["clauses"]
+            parts.append(f"{name} x{ratio:.2f} ({delta:+d})")
+        print(f"  {case_key(row)}: " + ", ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CrystalSAT build and solve benchmarks")
+    parser.add_argument("--grids", type=int, nargs="+", default=GRIDS)
+    parser.add_argument("--species", nargs="+", default=list(SPECIES), choices=list(SPECIES))
+    parser.add_argument("--cells", nargs="+", default=list(CELLS), choices=list(CELLS))
+    parser.add_argument("--n-solutions", type=int, default=10)
+    parser.add_argument("--no-pack", action="store_true", help="call initialise(pack=False)")
+    parser.add_argument("--max-clauses", type=float, default=5e6,
+                        help="skip cases whose exclusivity clauses alone exceed this estimate")
+    parser.add_argument("--quick", action="store_true", help="only run 4^3 and 6^3 with the smaller species sets")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    grids = [4, 6] if args.quick else args.grids
+    species_sets = [s for s in args.species if s != "all"] if args.quick else args.species
+    pack = not args.no_pack
+
+    rows = []
+    for grid in grids:
+        for species in species_sets:
+            k = len(SPECIES[species]) or len(CrystalSAT(1, 1, 1, 1, 1, 1, 90, 90, 90, []).ion_dict) + 118
+            for cell in args.cells:
+                if estimate_exclusivity(grid, k) > args.max_clauses:
+                    rows.append({"grid": grid, "species": species, "cell": cell, "pack": pack, "skipped": True})
+                    print(f"{grid}^3 {species:>5} {cell:>10}: skipped (too large)")
+                    continue
+
+                row = run_case(grid, species, cell, args.n_solutions, pack)
+                rows.append(row)
+                summary = "  ".join(f"{name} {s['seconds']:.3f}s" for name, s in row["stages"].items())
+                final = row["stages"]["solve_multiple"]
+                print(f"{grid}^3 {species:>5} {cell:>10}: {summary}  "
+                      f"clauses {final['clauses']} vars {final['vars']}")
+
+    with open(args.output, "w") as fp:
+        json.dump({"info": version_info(), "rows": rows}, fp, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            compare(rows, json.load(fp)["rows"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# startup_benchmark.py
+# --------------------
+# Times a bare `import CrystalSAT` plus the construction of a small model in
+# fresh interpreters, the cost every short-lived worker process pays, and lists
+# the heavy dependencies that were loaded along the way.
+#
+# Usage (from the repository root):
+#   python Benchmarks/startup_benchmark.py                     # 10 fresh interpreters
+#   python Benchmarks/startup_benchmark.py --runs 30 --budget-ms 100
+#
+# Exits with status 1 if the median time exceeds --budget-ms.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once a feature needs them
+HEAVY_MODULES = ["numpy", "scipy", "ase", "pymatgen", "mendeleev", "sqlalchemy", "periodictable",
+                 "asyncio", "multiprocessing"]
+
+# Runs in the child interpreter; prints the timings as JSON
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import CrystalSAT
+imported = time.perf_counter()
+CrystalSAT.CrystalSAT({n}, {n}, {n}, 8.0, 8.0, 8.0, 90, 90, 90, [("Pb", 2, "XII"), ("Ti", 4, "VI"), ("O", -2, "II")])
+built = time.perf_counter()
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"import_ms": (imported - start) * 1000, "construct_ms": (built - imported) * 1000, "heavy": heavy}}))
+"""
+
+
+def run_once(grid):
+    """
+    Imports CrystalSAT and builds one model in a fresh interpreter.
+    :param grid: grid points along each axis
+    :return: dict with import_ms, construct_ms and the heavy modules that were loaded
+    """
+    probe = PROBE.format(root=ROOT, n=grid, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CrystalSAT import and construction time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--grid", type=int, default=4)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    results = [run_once(args.grid) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    construct_ms = statistics.median(r["construct_ms"] for r in results)
+    total_ms = statistics.median(r["import_ms"] + r["construct_ms"] for r in results)
+    heavy = sorted({name for r in results for name in r["heavy"]})
+
+    print(f"import {import_ms:.1f} ms  construct {args.grid}^3 {construct_ms:.1f} ms  total {total_ms:.1f} ms "
+          f"(median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    print(f"heavy modules loaded: {', '.join(heavy) if heavy else 'none'}")
+
+    if total_ms > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
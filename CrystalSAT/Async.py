@@ -0,0 +1,153 @@
+
+# asyncio and multiprocessing are imported on first use, they are slow to import and most models never need them
+
+
+def _solve_worker(model, method, kwargs, conn):
+    """
+    Runs one solve method in a child process and streams its results back through a pipe.
+    Messages are ("solution", model), ("result", value), ("done", status) or ("error", exception).
+    """
+    try:
+        if method == "iter_solutions":
+            for solution in model.iter_solutions(**kwargs):
+                conn.send(("solution", solution))
+        else:
+            conn.send(("result", getattr(model, method)(**kwargs)))
+        conn.send(("done", model.status))
+
+    except Exception as e:
+        conn.send(("error", e))
+
+    finally:
+        conn.close()
+
+
+async def _receive(conn):
+    """
+    Waits for the next message on a pipe without blocking the event loop.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+
+    def on_readable():
+        if not ready.done():
+            ready.set_result(None)
+
+    try:
+        loop.add_reader(conn.fileno(), on_readable)
+    except NotImplementedError:
+        # event loops without pipe readers (e.g. the Windows proactor) wait in a thread instead
+        return await loop.run_in_executor(None, conn.recv)
+
+    try:
+        await ready
+    finally:
+        loop.remove_reader(conn.fileno())
+
+    return conn.recv()
+
+
+class AsyncMixin:
+
+    async def solve_async(self, solver_name="glucose3", timeout=None, conflict_budget=None, prop_budget=None, mp_context=None):
+        """
+        Awaitable version of solve().
+        The solver runs in a child process, because pysat holds the GIL while solving and a thread would stall the event loop.
+        Cancelling the awaiting task terminates the child process.
+        :param solver_name: Name of the SAT solver to use
+        :param timeout: wall-clock limit in seconds, None for no limit
+        :param conflict_budget: maximum number of conflicts, None for no limit
+        :param prop_budget: maximum number of propagations, None for no limit
+        :param mp_context: multiprocessing context used to start the child process, None for the default
+        :return: model if satisfiable, None if unsatisfiable or unknown
+        """
+        kwargs = dict(solver_name=solver_name, timeout=timeout, conflict_budget=conflict_budget, prop_budget=prop_budget)
+        result = None
+        async for kind, value in self._run_in_subprocess("solve", kwargs, mp_context):
+            if kind == "result":
+                result = value
+        return result
+
+
+    async def solve_multiple_async(self, solver_name="glucose3", n_solutions=1, timeout=None, conflict_budget=None,
+                                   prop_budget=None, mp_context=None):
+        """
+        Awaitable version of solve_multiple(), run in a child process.
+        :param solver_name: Name of the SAT solver to use
+        :param n_solutions: Number of solutions to find
+        :param timeout: wall-clock limit in seconds for the whole enumeration, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :param mp_context: multiprocessing context used to start the child process, None for the default
+        :return: List of solutions
+        """
+        return [solution async for solution in self.iter_solutions_async(solver_name=solver_name, n_solutions=n_solutions,
+                                                                         timeout=timeout, conflict_budget=conflict_budget,
+                                                                         prop_budget=prop_budget, mp_context=mp_context)]
+
+
+    async def iter_solutions_async(self, solver_name="glucose3", n_solutions=None, timeout=None, conflict_budget=None,
+                                   prop_budget=None, mp_context=None):
+        """
+        Asynchronous iterator over solutions, enumerated in a child process.
+        Each solution is yielded as soon as it is found. Leaving the loop early or cancelling the task
+        terminates the child process. self.status is updated when the enumeration finishes.
+        :param solver_name: Name of the SAT solver to use
+        :param n_solutions: Number of solutions to find, None to enumerate all of them
+        :param timeout: wall-clock limit in seconds for the whole enumeration, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :param mp_context: multiprocessing context used to start the child process, None for the default
+        :return: async generator of models
+        """
+        kwargs = dict(solver_name=solver_name, n_solutions=n_solutions, timeout=timeout,
+                      conflict_budget=conflict_budget, prop_budget=prop_budget)
+        messages = self._run_in_subprocess("iter_solutions", kwargs, mp_context)
+        try:
+            async for kind, value in messages:
+                if kind == "solution":
+                    yield value
+        finally:
+            await messages.aclose()
+
+
+    async def _run_in_subprocess(self, method, kwargs, mp_context):
+        """
+        Starts a child process running one solve method and yields its messages until it finishes.
+        :param method: name of the solve method to run
+        :param kwargs: keyword arguments for the method
+        :param mp_context: multiprocessing context, None for the default
+        :return: async generator of (kind, value) messages
+        """
+        import multiprocessing
+
+        ctx = mp_context or multiprocessing.get_context()
+        # other start methods than fork pickle the model, so the child gets its frozen form
+        model = self if ctx.get_start_method() == "fork" else self.freeze()
+        receiver, sender = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_solve_worker, args=(model, method, kwargs, sender), daemon=True)
+        process.start()
+        sender.close()
+
+        try:
+            while True:
+                try:
+                    kind, value = await _receive(receiver)
+                except EOFError:
+                    raise RuntimeError(f"Solver process exited unexpectedly with code {process.exitcode}.")
+
+                if kind == "error":
+                    raise value
+                elif kind == "done":
+                    self.status = value
+                    return
+
+                yield kind, value
+
+        finally:
+            receiver.close()
+            if process.is_alive():
+                process.terminate()
+            process.join()
@@ -1,6 +1,4 @@
 
-from ase import Atoms
-from ase.cell import Cell
 from pysat.formula import CNF
 from pysat.formula import IDPool
 
@@ -13,22 +11,51 @@ from .NeighborConstraints import NeighborConstraintsMixin
 from .Grab import GrabMixin
 from .Cardinality import CardinalityMixin
 from .SolveAndExport import SolveAndExportMixin
+from .Totalizer import TotalizerMixin
+from .MaxSAT import MaxSATMixin
+from .Async import AsyncMixin
+from .Sweep import SweepMixin
+from .Refine import RefineMixin
+from .Presolve import PresolveMixin
+from .Checkpoint import CheckpointMixin
+from .Sampling import SamplingMixin
+from .Frozen import FreezeMixin
+from .Supercell import SupercellMixin
+from .Energy import EnergyMixin
 
 
 class CrystalSAT(EncodingMixin,CoordinateMixin,GetMixin,
                  NeighborAndDistancesMixin,ConstraintsMixin,
                   NeighborConstraintsMixin,GrabMixin,CardinalityMixin,
-                  SolveAndExportMixin):
+                  SolveAndExportMixin,TotalizerMixin,MaxSATMixin,
+                  AsyncMixin,SweepMixin,RefineMixin,
+                  PresolveMixin,CheckpointMixin,SamplingMixin,
+                  FreezeMixin,SupercellMixin,EnergyMixin):
 
     def __init__(self, n_x,n_y,n_z,
                        a,b,c,alpha,
-                       beta,gamma,allowed):
+                       beta,gamma,allowed,sites=None,lazy=False):
 
         # specifying grid dimensions
         self.n_x = n_x
         self.n_y = n_y
         self.n_z = n_z
 
+        # optional candidate sites (fractional coordinates), used instead of the rectangular grid
+        # site i is position (i, 0, 0) of an n_sites x 1 x 1 grid
+        self.sites = None
+        self._sites_key = None  # hashable copy of the sites, the key of the cached distance tables
+        self.site_tolerance = 0.01  # distance (Å) within which a coordinate matches a candidate site
+        if sites is not None:
+            import numpy as np
+
+            sites = np.mod(np.asarray(sites, dtype=float).reshape(-1, 3), 1.0)
+            if (n_x, n_y, n_z) != (len(sites), 1, 1):
+                raise ValueError(f"A model with {len(sites)} candidate sites needs n_x = {len(sites)} and n_y = n_z = 1.")
+            sites.setflags(write=False)
+            self.sites = sites
+            self._sites_key = tuple(map(tuple, sites.tolist()))
+
         # specifying unit cell parameters
         self.a = a
         self.b = b
@@ -39,6 +66,12 @@ class CrystalSAT(EncodingMixin,CoordinateMixin,GetMixin,
 
         self.allowed = allowed
 
+        # in lazy mode atom types only get variables and clauses once a constraint refers to them (see activate())
+        self.lazy = lazy
+
+        # cardinality constraints are encoded as clauses unless use_native_cardinality() is called
+        self.native_cardinality = False
+
         # changes lower bound and use_allowed accordingly
         if len(allowed) > 0:
             self.use_allowed = True
@@ -57,24 +90,150 @@ class CrystalSAT(EncodingMixin,CoordinateMixin,GetMixin,
         self.k =  len(allowed) if self.use_allowed else 118 + len(self.ion_dict)
         self.max_real = self.n_x * n_y * n_z * self.k
 
-        # Initialize CNF and IDPool
-        self.cnf = CNF()
-        self.vpool = IDPool(start_from=self.max_real + 1)
-
-        # ASE cell object
-        self.cell = Cell.fromcellpar([self.a,self.b,self.c,self.alpha,self.beta,self.gamma])
+        # ASE cell object and grid used for geometry calculations
         self.valid_positions = [ (x,y,z) for x in range(self.n_x) for y in range(self.n_y) for z in range(self.n_z) ]
-        symbols = ['X'] * len(self.valid_positions)
-        frac_positions = [ (x/self.n_x, y/self.n_y, z/self.n_z) for (x,y,z) in self.valid_positions ]
-        cart_positions = [ self.cell.cartesian_positions([fp])[0] for fp in frac_positions ]
+        self.build_cell()
 
-        # Creates grid used for geometry calculations
-        self.grid = Atoms(symbols=symbols, positions=cart_positions, cell=self.cell, pbc=True)
+        # Initialize CNF, IDPool and the list of positions
+        self.session = None
+        self.reset_constraints()
 
         # Populate variable dictionary after all attributes are set
         self.var_dict = {}
         self.reverse_var_dict = {}
         self.populate_var_dict()
 
+
+    @classmethod
+    def from_sites(cls, sites, a, b, c, alpha, beta, gamma, allowed, lazy=False):
+        """
+        Builds a model on an explicit list of candidate sites instead of a rectangular grid,
+        e.g. Wyckoff positions or the sites of a prototype structure.
+        Site i is addressed as integer position (i, 0, 0).
+        :param sites: list of fractional (x, y, z) coordinates
+        :param a: length of a (Å)
+        :param b: length of b (Å)
+        :param c: length of c (Å)
+        :param alpha: angle alpha (degrees)
+        :param beta: angle beta (degrees)
+        :param gamma: angle gamma (degrees)
+        :param allowed: list of allowed atoms and ions
+        :param lazy: if True, atom types only get variables and clauses once a constraint refers to them
+        :return: CrystalSAT model
+        """
+        return cls(len(sites), 1, 1, a, b, c, alpha, beta, gamma, allowed, sites=sites, lazy=lazy)
+
+
+    @classmethod
+    def from_cif(cls, filename, allowed):
+        """
+        Builds a model whose candidate sites and cell are taken from a prototype CIF file.
+        :param filename: path to the CIF file
+        :param allowed: list of allowed atoms and ions
+        :return: CrystalSAT model
+        """
+        from ase.io import read
+
+        prototype = read(filename)
+        a, b, c, alpha, beta, gamma = prototype.cell.cellpar().tolist()
+        return cls.from_sites(prototype.get_scaled_positions(wrap=True), a, b, c, alpha, beta, gamma, allowed)
+
+
+    def build_cell(self):
+        """
+        Discards the ASE cell and grid, so they are rebuilt from the current cell parameters when next used.
+        Building them needs ASE, which is only imported once geometry is actually used.
+        :return:
+        """
+        self._cell = None
+        self._grid = None
+
+
+    @property
+    def cell(self):
+        """
+        ASE cell of the current cell parameters.
+        """
+        if self._cell is None:
+            from ase.cell import Cell
+
+            self._cell = Cell.fromcellpar([self.a,self.b,self.c,self.alpha,self.beta,self.gamma])
+        return self._cell
+
+
+    @property
+    def grid(self):
+        """
+        ASE Atoms object with one placeholder atom per grid position (or candidate site), used for geometry calculations.
+        """
+        if self._grid is None:
+            from ase import Atoms
+
+            symbols = ['X'] * len(self.valid_positions)
+            cart_positions = self.to_cart_array(self.valid_positions)
+
+            self._grid = Atoms(symbols=symbols, positions=cart_positions, cell=self.cell, pbc=True)
+        return self._grid
+
+
+    def __getstate__(self):
+        # the IDPool maps objects to IDs with a defaultdict of a local lambda and a solver session is a C object,
+        # neither pickles, so the pool is stored as its counter and mappings and the session is left closed
+        state = self.__dict__.copy()
+        state["vpool"] = {"top": self.vpool.top, "_occupied": list(self.vpool._occupied),
+                          "obj2id": dict(self.vpool.obj2id), "id2obj": dict(self.vpool.id2obj),
+                          "with_neg": self.vpool.with_neg}
+        state["session"] = None
+        state["session_selectors"] = {}
+        state["_cell"] = None
+        state["_grid"] = None
+        return state
+
+
+    def __setstate__(self, state):
+        vpool = IDPool()
+        vpool.obj2id.update(state["vpool"].pop("obj2id"))
+        vpool.__dict__.update(state["vpool"])
+        state["vpool"] = vpool
+        self.__dict__.update(state)
+
+
+    def reset_constraints(self):
+        """
+        Removes all constraints, returning the model to its state right after construction.
+        :return:
+        """
+        self.cnf = CNF()
+        self.vpool = IDPool(start_from=self.max_real + 1)
+
         # List of all positions in the grid
         self.positions = [(x, y, z) for x in range(self.n_x) for y in range(self.n_y) for z in range(self.n_z)]
+
+        # Active atom types and the types allowed at each position; positions missing from domains allow all active types
+        self.all_types = () if self.lazy else range(self.lower, self.k)
+        self.domains = {}
+        self.exclusive = False
+
+        # Distance-dependent constraints, kept so they can be regenerated when the cell changes
+        self.distance_specs = []
+        self.distance_clauses = {}
+
+        # Binary clauses added by add_binary_clauses() and by the distance constraints, counts of the binary clauses
+        # skipped as duplicate or implied (per group for the distance constraints) and the unit clauses found so far
+        # (see _implied_literals())
+        self.binary_clauses = set()
+        self.distance_binaries = set()
+        self.dropped_binaries = {"duplicates": 0, "subsumed": 0}
+        self.dropped_distance = {}
+        self._unit_scan = (None, 0, set())
+
+        # Native at-most constraints (lits, bound), see use_native_cardinality()
+        self.atmosts = []
+
+        # Simplified CNF loaded into the solvers (see presolve()) and a counter of in-place edits to the clauses
+        self.presolved = None
+        self.cnf_revision = 0
+
+        if self.session is not None:
+            self.close_session()
+        self.session_selectors = {}
@@ -0,0 +1,158 @@
+
+import json
+import time
+from collections import Counter
+
+from .Base import CrystalSAT
+from .Cache import warm_cache
+
+
+# grid distance tables kept per worker, see Cache.grid_offset_distances
+MAX_SHARED_CELLS = 32
+
+
+def _species(item):
+    """
+    Converts a species from a job spec to the form used in allowed lists.
+    JSON has no tuples, so ions arrive as lists [symbol, charge, cn].
+    """
+    return tuple(item) if isinstance(item, list) else item
+
+
+def _cell_key(job):
+    return (job["n_x"], job["n_y"], job["n_z"],
+            (job["a"], job["b"], job["c"], job["alpha"], job["beta"], job["gamma"]))
+
+
+def _atom_id(crystal, species):
+    species = _species(species)
+    return crystal.atom_id(*species) if isinstance(species, tuple) else crystal.atom_id(species)
+
+
+def run_job(job):
+    """
+    Builds and solves one job.
+
+    A job is a dict with the grid and cell parameters (n_x, n_y, n_z, a, b, c, alpha, beta, gamma),
+    the allowed species and optional settings:
+        sites: fractional candidate sites used instead of the grid (n_x, n_y and n_z are then not needed)
+        lazy: if True, only the species that the bounds and isolations refer to get variables
+        native_cardinality: if True, keeps the bounds and exclusivity as native at-most constraints (for minicard/gluecard)
+        pack: passed to initialise() (default True)
+        bounds: list of [species, min_count, max_count]
+        isolate: list of [species, cutoff, tolerance]
+        fill: if True, calls fill_unit_cell()
+        presolve: if True, calls presolve() before solving; pure site variables are only fixed for single-solution jobs
+        solver, n_solutions, timeout: passed to solve_multiple() (defaults "glucose3", 1, None)
+        sample: dict of sample_solutions() options (method, min_distance, seed, xor_size); if given, the n_solutions
+            solutions are drawn as diverse samples instead of in solver order
+        id: returned unchanged in the result
+
+    :param job: job spec
+    :return: dict with the id, status, decoded solutions (fractional coordinates), CNF size, timings and enumeration metrics
+    """
+    start = time.perf_counter()
+    result = {"id": job.get("id")}
+
+    try:
+        allowed = [_species(item) for item in job["allowed"]]
+        if "sites" in job:
+            crystal = CrystalSAT.from_sites(job["sites"], job["a"], job["b"], job["c"],
+                                            job["alpha"], job["beta"], job["gamma"], allowed, lazy=job.get("lazy", False))
+        else:
+            crystal = CrystalSAT(job["n_x"], job["n_y"], job["n_z"],
+                                 job["a"], job["b"], job["c"], job["alpha"], job["beta"], job["gamma"], allowed,
+                                 lazy=job.get("lazy", False))
+        if job.get("native_cardinality"):
+            crystal.use_native_cardinality()
+        crystal.initialise(pack=job.get("pack", True))
+
+        for species, min_count, max_count in job.get("bounds", ()):
+            crystal.bound_atom(_atom_id(crystal, species), min_count, max_count)
+
+        for species, cutoff, tolerance in job.get("isolate", ()):
+            crystal.isolate(_atom_id(crystal, species), cutoff, tolerance)
+
+        if job.get("fill"):
+            crystal.fill_unit_cell()
+
+        if job.get("presolve"):
+            crystal.presolve(eliminate_pure=job.get("n_solutions", 1) == 1)
+
+        built = time.perf_counter()
+        if "sample" in job:
+            solutions = crystal.sample_solutions(solver_name=job.get("solver", "glucose3"),
+                                                 n_samples=job.get("n_solutions", 1),
+                                                 timeout=job.get("timeout"), **job["sample"])
+        else:
+            solutions = crystal.solve_multiple(solver_name=job.get("solver", "glucose3"),
+                                               n_solutions=job.get("n_solutions", 1),
+                                               timeout=job.get("timeout"))
+        solved = time.perf_counter()
+
+        result.update({
+            "status": crystal.status,
+            "solutions": [crystal.decode_solution(solution, system_output="frac") for solution in solutions],
+            "n_clauses": len(crystal.solver_clauses()),
+            "n_vars": max(crystal.cnf.nv, crystal.vpool.top),
+            "build_seconds": built - start,
+            "solve_seconds": solved - built,
+            "progress": getattr(crystal, "progress", None),
+        })
+
+    except Exception as e:
+        result.update({"status": None, "error": f"{type(e).__name__}: {e}"})
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, processes=None, sink=None, mp_context=None):
+    """
+    Runs many jobs in a process pool and yields their results as they finish.
+    The species radii, the ion registry and the grid distance table of every cell used by more than one job
+    are computed once before the pool starts, so forked workers share them instead of rebuilding them per job.
+    :param jobs: iterable of job specs (see run_job)
+    :param processes: number of worker processes, None for one per core
+    :param sink: optional callable receiving each result, e.g. a JsonLinesSink
+    :param mp_context: multiprocessing context, None for the default
+    :return: generator of results in completion order
+    """
+    jobs = list(jobs)
+
+    species = sorted({_species(item) for job in jobs for item in job["allowed"]}, key=str)
+    cell_counts = Counter(_cell_key(job) for job in jobs if "sites" not in job)
+    cells = [cell for cell, count in cell_counts.most_common(MAX_SHARED_CELLS) if count > 1]
+
+    warm_cache(species, cells)
+
+    import multiprocessing
+
+    ctx = mp_context or multiprocessing.get_context()
+    with ctx.Pool(processes, initializer=warm_cache, initargs=(species, cells)) as pool:
+        for result in pool.imap_unordered(run_job, jobs):
+            if sink is not None:
+                sink(result)
+            yield result
+
+
+class JsonLinesSink:
+    """
+    Writes batch results to a file, one JSON object per line, flushing after each result.
+    """
+
+    def __init__(self, filename, mode="a"):
+        self.fp = open(filename, mode)
+
+    def __call__(self, result):
+        self.fp.write(json.dumps(result) + "\n")
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,316 @@
+
+# Read-only data shared by every model in a process.
+# Each loader computes its result once; batch workers forked after warm_cache() inherit the results.
+
+import json
+import os
+from functools import lru_cache
+
+# Shannon radii table shipped alongside the package
+SHANNON_RADII_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shannon-radii.json")
+
+
+@lru_cache(maxsize=None)
+def shannon_data():
+    """
+    Loads the Shannon radii table.
+    :return: dict symbol -> charge -> coordination number -> radii
+    """
+    with open(SHANNON_RADII_PATH) as fp:
+        return json.load(fp)
+
+
+@lru_cache(maxsize=None)
+def ion_registry():
+    """
+    Builds the registry of ions from the Shannon radii table. Ion IDs start at 119, after the elements.
+    :return: (ion_dict, reverse_ion_dict) mapping ID -> (symbol, charge, cn) and back
+    """
+    ion_dict = {}
+    reverse_ion_dict = {}
+    idx = 119
+
+    for symbol, charges in shannon_data().items():
+        for charge_str, cn_dict in charges.items():
+            try:
+                charge = int(charge_str)
+            except ValueError:
+                continue
+            for cn_str in cn_dict.keys():
+                ion_dict[idx] = (symbol, charge, cn_str)
+                reverse_ion_dict[(symbol, charge, cn_str)] = idx
+                idx += 1
+
+    return ion_dict, reverse_ion_dict
+
+
+@lru_cache(maxsize=None)
+def element_symbol(number):
+    """
+    Gets the symbol of an element.
+    :param number: atomic number
+    :return: str element symbol
+    """
+    import periodictable
+
+    return periodictable.elements[number].symbol
+
+
+@lru_cache(maxsize=None)
+def atomic_number(symbol):
+    """
+    Gets the atomic number of an element.
+    :param symbol: str element symbol
+    :return: int atomic number
+    """
+    import periodictable
+
+    return periodictable.elements.symbol(symbol).number
+
+
+@lru_cache(maxsize=None)
+def element_radius(symbol):
+    """
+    Gets the van der Waals radius of an element, falling back to its covalent radius.
+    :param symbol: str element symbol (e.g., "O", "Na", "Fe")
+    :return: float radius in Angstroms
+    """
+    from mendeleev import element
+
+    el = element(symbol)
+    r = el.vdw_radius
+
+    if r is None:
+        r = el.covalent_radius
+        if r is None:
+            raise ValueError(f"No radius found for element {symbol}.")
+
+    return r / 100
+
+
+@lru_cache(maxsize=None)
+def ion_radius(symbol, charge, cn):
+    """
+    Gets the Shannon ionic radius of an ion.
+    :param symbol: str element symbol
+    :param charge: int charge of the ion
+    :param cn: coordination number
+    :return: float radius in Angstroms
+    """
+    key = (symbol, charge, cn)
+    try:
+        r_ionic = shannon_data()[symbol][str(charge)][cn].get("r_ionic")
+    except KeyError as e:
+        raise ValueError(f"No Shannon ionic radius found for {key}. Error: {e}")
+
+    if r_ionic is None:
+        raise ValueError(f"No Shannon ionic radius found for {key}. ")
+    return r_ionic
+
+
+@lru_cache(maxsize=32)
+def grid_offset_distances(n_x, n_y, n_z, cellpar):
+    """
+    Computes the minimum-image length of every offset vector of a periodic grid.
+    The distance between two grid positions only depends on their offset, so this table of n_x * n_y * n_z entries
+    stands for the full distance matrix without its quadratic memory.
+    :param n_x: grid points along a
+    :param n_y: grid points along b
+    :param n_z: grid points along c
+    :param cellpar: tuple (a, b, c, alpha, beta, gamma)
+    :return: read-only numpy array of shape (n_sites,), indexed by flattened offset (dx * n_y + dy) * n_z + dz
+    """
+    import numpy as np
+    from ase.cell import Cell
+    from ase.geometry import find_mic
+
+    cell = Cell.fromcellpar(list(cellpar))
+    ix, iy, iz = [i.ravel() for i in np.meshgrid(np.arange(n_x), np.arange(n_y), np.arange(n_z), indexing="ij")]
+
+    offsets = np.stack([ix / n_x, iy / n_y, iz / n_z], axis=1) @ cell.array
+    _, offset_dist = find_mic(offsets, cell, pbc=True)
+
+    offset_dist.setflags(write=False)
+    return offset_dist
+
+
+@lru_cache(maxsize=4)
+def site_distances(sites, cellpar):
+    """
+    Computes the minimum-image distance between every pair of candidate sites.
+    Candidate sites have no periodic offsets, so the full matrix is kept; only the last few are cached.
+    :param sites: tuple of fractional (x, y, z) tuples
+    :param cellpar: tuple (a, b, c, alpha, beta, gamma)
+    :return: read-only numpy array of shape (n_sites, n_sites)
+    """
+    import numpy as np
+    from ase.cell import Cell
+    from ase.geometry import find_mic
+
+    cell = Cell.fromcellpar(list(cellpar))
+    frac = np.asarray(sites, dtype=float)
+    n_sites = len(frac)
+
+    vectors = (frac[None, :, :] - frac[:, None, :]).reshape(-1, 3) @ cell.array
+    _, distances = find_mic(vectors, cell, pbc=True)
+    distances = distances.reshape(n_sites, n_sites)
+
+    distances.setflags(write=False)
+    return distances
+
+
+def _image_distances(offsets, cell, cutoff):
+    """
+    Computes the lengths of the periodic images of fractional offsets, in chunks of offsets.
+    Every lattice translation that can bring an offset in [0, 1) within the cutoff is included.
+    :return: generator of (start, distances), distances of shape (chunk, n_images) for offsets[start:start + chunk]
+    """
+    import numpy as np
+
+    reach = np.ceil(cutoff * np.linalg.norm(cell.reciprocal(), axis=1)).astype(int) + 1
+    images = np.stack(np.meshgrid(*[np.arange(-r, r + 1) for r in reach], indexing="ij"), axis=-1).reshape(-1, 3)
+
+    chunk = max(1, 2 ** 20 // len(images))
+    for start in range(0, len(offsets), chunk):
+        block = offsets[start:start + chunk]
+        yield start, np.linalg.norm((block[:, None, :] + images[None, :, :]) @ cell.array, axis=-1)
+
+
+def _image_sums(offsets, cell, cutoff, alpha, rho):
+    """
+    Sums the Wolf Coulomb and Born-Mayer kernels over the periodic images of each fractional offset within the cutoff.
+    The kernels are only evaluated at the images inside the cutoff.
+    :return: (coulomb, repulsion) float numpy arrays of shape (len(offsets),)
+    """
+    import numpy as np
+    from scipy.special import erfc
+
+    shift = erfc(alpha * cutoff) / cutoff
+    coulomb = np.zeros(len(offsets))
+    repulsion = np.zeros(len(offsets))
+    for start, d in _image_distances(offsets, cell, cutoff):
+        rows, cols = np.nonzero((d > 1e-9) & (d <= cutoff))
+        inside = d[rows, cols]
+        coulomb[start:start + len(d)] = np.bincount(rows, erfc(alpha * inside) / inside - shift, minlength=len(d))
+        repulsion[start:start + len(d)] = np.bincount(rows, np.exp(-inside / rho), minlength=len(d))
+    return coulomb, repulsion
+
+
+def _image_counts(offsets, cell, low, high):
+    """
+    Counts the periodic images of each fractional offset at a distance in [low, high], leaving out the zero offset.
+    :return: int numpy array of shape (len(offsets),)
+    """
+    import numpy as np
+
+    counts = np.zeros(len(offsets), dtype=np.int64)
+    for start, d in _image_distances(offsets, cell, high):
+        counts[start:start + len(d)] = ((d > 1e-9) & (d >= low) & (d <= high)).sum(axis=1)
+    return counts
+
+
+@lru_cache(maxsize=32)
+def grid_image_counts(n_x, n_y, n_z, cellpar, low, high):
+    """
+    Counts, for every offset vector of a periodic grid, its lattice images at a distance in [low, high].
+    A position sees another one once per such image, e.g. several times when the cell is smaller than twice the cutoff.
+    :param n_x: grid points along a
+    :param n_y: grid points along b
+    :param n_z: grid points along c
+    :param cellpar: tuple (a, b, c, alpha, beta, gamma)
+    :param low: smallest distance counted (Å)
+    :param high: largest distance counted (Å)
+    :return: read-only int numpy array of shape (n_sites,), indexed by flattened offset (dx * n_y + dy) * n_z + dz
+    """
+    import numpy as np
+    from ase.cell import Cell
+
+    cell = Cell.fromcellpar(list(cellpar))
+    ix, iy, iz = [i.ravel() for i in np.meshgrid(np.arange(n_x), np.arange(n_y), np.arange(n_z), indexing="ij")]
+    counts = _image_counts(np.stack([ix / n_x, iy / n_y, iz / n_z], axis=1), cell, low, high)
+
+    counts.setflags(write=False)
+    return counts
+
+
+@lru_cache(maxsize=4)
+def site_image_counts(sites, cellpar, low, high):
+    """
+    Counts, for every pair of candidate sites, the lattice images of the second site at a distance in [low, high]
+    from the first one; a site also sees its own images.
+    :param sites: tuple of fractional (x, y, z) tuples
+    :param cellpar: tuple (a, b, c, alpha, beta, gamma)
+    :param low: smallest distance counted (Å)
+    :param high: largest distance counted (Å)
+    :return: read-only int numpy array of shape (n_sites, n_sites)
+    """
+    import numpy as np
+    from ase.cell import Cell
+
+    cell = Cell.fromcellpar(list(cellpar))
+    frac = np.asarray(sites, dtype=float)
+    counts = _image_counts(((frac[None, :, :] - frac[:, None, :]) % 1.0).reshape(-1, 3), cell, low, high)
+    counts = counts.reshape(len(frac), len(frac))
+
+    counts.setflags(write=False)
+    return counts
+
+
+@lru_cache(maxsize=4)
+def pair_kernels(n_x, n_y, n_z, cellpar, sites, cutoff, alpha, rho):
+    """
+    Sums the pair terms of the energy proxy over every periodic image within the cutoff, for every pair of positions:
+    the damped shifted (Wolf) Coulomb kernel erfc(alpha d) / d - erfc(alpha cutoff) / cutoff and the
+    Born-Mayer kernel exp(-d / rho). A position does not interact with itself, but does with its own images.
+    On a rectangular grid the kernels only depend on the periodic offset between two positions, so only one value
+    per offset is kept; candidate sites get full matrices, computed one block of source sites at a time.
+    :param n_x: grid points along a
+    :param n_y: grid points along b
+    :param n_z: grid points along c
+    :param cellpar: tuple (a, b, c, alpha, beta, gamma)
+    :param sites: tuple of fractional (x, y, z) tuples of the candidate sites, None for the grid
+    :param cutoff: cutoff distance (Å)
+    :param alpha: Wolf damping parameter (1/Å)
+    :param rho: Born-Mayer decay length (Å)
+    :return: (coulomb, repulsion) read-only numpy arrays, of shape (n_sites,) indexed by flattened offset
+             (dx * n_y + dy) * n_z + dz on a grid, of shape (n_sites, n_sites) indexed by flattened position for sites
+    """
+    import numpy as np
+    from ase.cell import Cell
+
+    cell = Cell.fromcellpar(list(cellpar))
+    if sites is None:
+        ix, iy, iz = [i.ravel() for i in np.meshgrid(np.arange(n_x), np.arange(n_y), np.arange(n_z), indexing="ij")]
+        coulomb, repulsion = _image_sums(np.stack([ix / n_x, iy / n_y, iz / n_z], axis=1), cell, cutoff, alpha, rho)
+    else:
+        frac = np.asarray(sites, dtype=float)
+        offsets = (frac[None, :, :] - frac[:, None, :]) % 1.0
+        coulomb, repulsion = _image_sums(offsets.reshape(-1, 3), cell, cutoff, alpha, rho)
+        coulomb, repulsion = coulomb.reshape(len(frac), -1), repulsion.reshape(len(frac), -1)
+
+    coulomb.setflags(write=False)
+    repulsion.setflags(write=False)
+    return coulomb, repulsion
+
+
+def warm_cache(species=(), cells=()):
+    """
+    Fills the caches ahead of time, e.g. before forking batch workers.
+    :param species: atoms (symbols) and ions ((symbol, charge, cn)) whose radii should be loaded
+    :param cells: tuples (n_x, n_y, n_z, (a, b, c, alpha, beta, gamma)) whose grid distance tables should be computed
+    :return:
+    """
+    ion_registry()
+
+    for particle in species:
+        # unknown species are left for the model that uses them to report
+        try:
+            if isinstance(particle, (tuple, list)):
+                ion_radius(*particle)
+            else:
+                element_radius(particle)
+        except (ValueError, TypeError):
+            continue
+
+    for n_x, n_y, n_z, cellpar in cells:
+        grid_offset_distances(n_x, n_y, n_z, tuple(cellpar))
@@ -1,5 +1,3 @@
-from pysat.card import CardEnc
-
 class CardinalityMixin:
 
     def bound_atom(self, atom_id, min_count = None, max_count = None):
@@ -13,6 +11,7 @@ class CardinalityMixin:
 
         """
 
+        self.activate_types([atom_id])
         available  = self.grab_available_positions(atom_id)
         forced_count = len(self.grab_forced(atom_id))
         if min_count is not None:
@@ -20,17 +19,107 @@ class CardinalityMixin:
             if adjusted_min_count > forced_count + len(available):
                 raise ValueError(f"min_count {min_count} is greater than the number of available positions {len(available)} + forced atoms {forced_count} for atom type {atom_id}.")
 
-            atleast = CardEnc.atleast(lits = available, bound=adjusted_min_count, encoding = 1, vpool= self.vpool)
-
-            self.cnf.extend(atleast.clauses)
-            self.vpool.start_from = self.vpool.id
+            self.add_atleast(available, adjusted_min_count)
 
         if max_count is not None:
             adjusted_max_count = max_count - forced_count
             if adjusted_max_count < 0:
                 raise ValueError(f"max_count {max_count} is less than the number of forced atoms {forced_count} for atom type {atom_id}.")
             else:
-                atmost = CardEnc.atmost(lits = available, bound=adjusted_max_count, encoding = 1, vpool = self.vpool)
-                self.cnf.extend(atmost.clauses)
-                self.vpool.start_from = self.vpool.id
+                self.add_atmost(available, adjusted_max_count)
+
+
+    def use_native_cardinality(self, enabled=True):
+        """
+        Keeps the cardinality constraints added from now on (bound_atom(), the exclusivity of initialise(), ...)
+        as native at-most constraints in self.atmosts instead of encoding them into clauses and auxiliary variables.
+        Solvers with native cardinality support (minicard, gluecard3, gluecard4) receive them directly;
+        for any other solver they are encoded when the solver is created.
+        :param enabled: if False, goes back to encoding cardinality constraints as clauses
+        :return:
+        """
+        self.native_cardinality = enabled
+
+
+    def add_atmost(self, lits, bound):
+        """
+        Adds the constraint that at most bound of the literals are true,
+        natively if use_native_cardinality() is on, else as clauses.
+        :param lits: list of literals
+        :param bound: maximum number of true literals
+        :return:
+        """
+        from pysat.card import CardEnc
+
+        lits = list(lits)
+        if bound >= len(lits):
+            return
+        if bound < 0:
+            self.cnf.append([])
+            return
+
+        if self.native_cardinality:
+            self.atmosts.append((lits, bound))
+            return
+
+        atmost = CardEnc.atmost(lits = lits, bound=bound, encoding = 1, vpool = self.vpool)
+        self.cnf.extend(atmost.clauses)
+        self.vpool.start_from = self.vpool.id
+
+
+    def add_atleast(self, lits, bound):
+        """
+        Adds the constraint that at least bound of the literals are true.
+        Natively it is kept as an at-most constraint on the negated literals.
+        :param lits: list of literals
+        :param bound: minimum number of true literals
+        :return:
+        """
+        from pysat.card import CardEnc
+
+        lits = list(lits)
+        if bound <= 0:
+            return
+
+        if self.native_cardinality:
+            self.add_atmost([-lit for lit in lits], len(lits) - bound)
+            return
+
+        atleast = CardEnc.atleast(lits = lits, bound=bound, encoding = 1, vpool= self.vpool)
+        self.cnf.extend(atleast.clauses)
+        self.vpool.start_from = self.vpool.id
+
+
+    def encode_atmosts(self, atmosts, top_id):
+        """
+        Encodes native at-most constraints as clauses, for solvers without native cardinality support.
+        :param atmosts: list of (lits, bound) pairs
+        :param top_id: largest variable ID in use; auxiliary variables are numbered from top_id + 1
+        :return: (clauses, new top_id)
+        """
+        from pysat.card import CardEnc
+
+        clauses = []
+        for lits, bound in atmosts:
+            atmost = CardEnc.atmost(lits=lits, bound=bound, top_id=top_id, encoding=1)
+            clauses.extend(atmost.clauses)
+            top_id = max(top_id, atmost.nv)
+        return clauses, top_id
+
+
+    def _load_atmosts(self, solver, atmosts, top_id):
+        """
+        Adds native at-most constraints to a solver, encoding them as clauses if the solver does not support them.
+        :return: largest variable ID in use afterwards
+        """
+        if not atmosts:
+            return top_id
+
+        if solver.supports_atmost():
+            for lits, bound in atmosts:
+                solver.add_atmost(lits, bound)
+            return top_id
 
+        clauses, top_id = self.encode_atmosts(atmosts, top_id)
+        solver.append_formula(clauses)
+        return top_id
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import time
+from array import array
+from itertools import chain
+
+
+class CheckpointMixin:
+
+    def model_hash(self):
+        """
+        Fingerprint of the problem the solvers are loaded with: grid, species, clauses and at-most constraints
+        (after presolve(), if it was called). A checkpoint only resumes against a model with the same hash.
+        :return: hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(repr((self.n_x, self.n_y, self.n_z, self.k, list(self.allowed))).encode())
+
+        digest.update(array("q", chain.from_iterable(clause + [0] for clause in self.solver_clauses())).tobytes())
+        for lits, bound in self.solver_atmosts():
+            digest.update(array("q", lits + [0, bound]).tobytes())
+        if self.presolved is not None:
+            digest.update(array("q", self.presolved["old_vars"] + [0] + self.presolved["fixed"]).tobytes())
+
+        return digest.hexdigest()
+
+
+    def occupancy(self, solution):
+        """
+        Converts a solution to the atom type at every position.
+        :param solution: model (list of literals)
+        :return: int numpy array of shape (n_sites,), indexed by flattened position, -1 where the position is empty
+        """
+        import numpy as np
+
+        occupied = np.array([lit for lit in solution if lit > 0 and self.is_site_var(lit)], dtype=np.int64)
+        types = np.full(self.n_x * self.n_y * self.n_z, -1, dtype=np.int64)
+        types[(occupied - 1) // self.k] = (occupied - 1) % self.k
+        return types
+
+
+    def load_checkpoint(self, filename):
+        """
+        Reads an enumeration checkpoint written by iter_solutions().
+        The blocking clauses are stored as one bit row per solution over the variables they mention.
+        :param filename: path of the checkpoint file
+        :return: dict with model_hash, status, block_vars (solver variables of the blocking clauses) and bits
+        """
+        import numpy as np
+
+        with np.load(filename) as data:
+            return {
+                "model_hash": str(data["model_hash"]),
+                "status": str(data["status"]) or None,
+                "block_vars": data["block_vars"].tolist(),
+                "bits": list(data["bits"]),
+            }
+
+
+    def _open_checkpoint(self, filename):
+        """
+        Loads the checkpoint of this model, or starts an empty one if the file does not exist yet.
+        """
+        model_hash = self.model_hash()
+        if not os.path.exists(filename):
+            return {"model_hash": model_hash, "status": None, "block_vars": None, "bits": [], "saved": time.monotonic()}
+
+        store = self.load_checkpoint(filename)
+        if store["model_hash"] != model_hash:
+            raise ValueError(f"Checkpoint {filename} was written for a different model, remove it to start over.")
+        store["saved"] = time.monotonic()
+        return store
+
+
+    def _checkpoint_models(self, store):
+        """
+        Rebuilds the stored solutions as models of the solver, restricted to the variables of the blocking clauses.
+        """
+        import numpy as np
+
+        n_vars = len(store["block_vars"] or ())
+        block_vars = np.array(store["block_vars"] or (), dtype=np.int64)
+        for row in store["bits"]:
+            truth = np.unpackbits(row, count=n_vars).astype(bool)
+            yield np.where(truth, block_vars, -block_vars).tolist()
+
+
+    def _record_solution(self, store, blocking_clause):
+        """
+        Adds a solution to a checkpoint, given by its blocking clause.
+        """
+        import numpy as np
+
+        if store["block_vars"] is None:
+            store["block_vars"] = [abs(lit) for lit in blocking_clause]
+        # a literal of the blocking clause is negative where the solution sets the variable true
+        store["bits"].append(np.packbits(np.array(blocking_clause) < 0))
+
+
+    def _save_checkpoint(self, filename, store):
+        """
+        Writes a checkpoint atomically, so a crash while saving leaves the previous one intact.
+        """
+        import numpy as np
+
+        n_bytes = (len(store["block_vars"] or ()) + 7) // 8
+        bits = np.array(store["bits"], dtype=np.uint8).reshape(len(store["bits"]), n_bytes)
+
+        partial = f"{filename}.partial"
+        with open(partial, "wb") as f:
+            np.savez_compressed(f, model_hash=store["model_hash"], status=store["status"] or "",
+                                block_vars=np.array(store["block_vars"] or (), dtype=np.int64), bits=bits)
+        os.replace(partial, filename)
+        store["saved"] = time.monotonic()
@@ -1,5 +1,5 @@
 
-from itertools import combinations, combinations_with_replacement
+from itertools import combinations
 
 class ConstraintsMixin:
 
@@ -12,41 +12,129 @@ class ConstraintsMixin:
         :return:
         """
 
+        conflicts = []
         for x,y,z in self.positions:
-            # needs fixing
             types_for_this_pos = self.get_types(x, y, z, system="int", pos_rounding="int")
             # No two atoms of the different type can occupy the same position
-            for i,j in combinations(range(self.lower,self.k), 2):
+            if self.native_cardinality:
+                self.add_atmost(types_for_this_pos, 1)
+                continue
+            for var_1, var_2 in combinations(types_for_this_pos, 2):
 
-                self.cnf.append([-types_for_this_pos[i-self.lower], -types_for_this_pos[j-self.lower]])
+                conflicts.append([-var_1, -var_2])
+
+        self.add_binary_clauses(conflicts)
+
+        self.exclusive = True
 
         # Sphere packing constraints: Forbids overlapping atoms based on their radii.
         # Uses ionic radii for ions and vdw/covalent radii for atoms
 
         if pack:
-            max_radius = self.get_max_radius()
-            radii = [self.get_radius(*self.inverse_id(i)) if isinstance(self.inverse_id(i), tuple) else self.get_radius(
-                self.inverse_id(i)) for i in range(self.lower,self.k)]
-            cutoff = max_radius * 2.0
+            self.add_distance_constraint(("pack",))
+
+
+    def add_binary_clauses(self, clauses):
+        """
+        Adds binary clauses to the CNF, skipping those already added (in either literal order)
+        and those implied by a unit clause. Skipped clauses are counted in self.dropped_binaries.
+        :param clauses: iterable of [lit_1, lit_2] clauses
+        :return: number of clauses added
+        """
+        units = self._implied_literals()
+        added = 0
+
+        for clause in clauses:
+            key = tuple(sorted(clause))
+            if key in self.binary_clauses:
+                self.dropped_binaries["duplicates"] += 1
+            elif key[0] in units or key[1] in units:
+                self.dropped_binaries["subsumed"] += 1
+            else:
+                self.binary_clauses.add(key)
+                self.cnf.append(list(key))
+                added += 1
+
+        return added
+
+
+    def packing_clauses(self):
+        """
+        Generates the sphere packing clauses for the current cell.
+        Forbids any two atoms whose radii overlap at the distance between their positions.
+        :return: int numpy array of shape (m, 2), one binary clause per row
+        """
+        import numpy as np
+
+        types = list(self.all_types)
+        if not types:
+            return []
+        radii = np.array([self.get_radius(*self.inverse_id(i)) if isinstance(self.inverse_id(i), tuple) else self.get_radius(
+            self.inverse_id(i)) for i in types])
+        cutoff = self.get_max_radius() * 2.0
+
+        # unordered pairs of positions within the largest possible overlap distance
+        sources, targets = self.neighbor_pairs(cutoff, 0.0)
+        pairs = sources < targets
+        sources, targets = sources[pairs], targets[pairs]
+        dist = self.pair_distances(sources, targets)
+        mask = self.type_mask(types)
+
+        # every pair of types allowed at the two positions whose radii overlap, one block of clauses per type pair
+        blocks = []
+        for i, type_i in enumerate(types):
+            for j, type_j in enumerate(types):
+                keep = (dist < radii[i] + radii[j]) & mask[sources, i] & mask[targets, j]
+                blocks.append(np.stack([-(sources[keep] * self.k + type_i + 1),
+                                        -(targets[keep] * self.k + type_j + 1)], axis=1))
+
+        return np.concatenate(blocks)
+
+
+    def restrict_positions(self, positions, types=None):
+        """
+        Limits the model to a subset of the grid positions. All other positions get an empty domain and are skipped
+        by the constraints added afterwards, so call this before initialise().
+        :param positions: iterable of (x, y, z) grid positions that may be occupied
+        :param types: optional dict (x, y, z) -> atom type IDs allowed at that position; positions missing from it allow every type
+        :return:
+        """
+        keep = set(map(tuple, positions))
+
+        for x, y, z in self.positions:
+            if (x, y, z) not in keep:
+                self.restrict_domain(x, y, z, ())
+            elif types is not None and (x, y, z) in types:
+                self.restrict_domain(x, y, z, types[(x, y, z)])
 
-            for (x1, y1, z1), (x2, y2, z2) in combinations(self.positions, 2):
-                idx1 = x1 * (self.n_y * self.n_z) + y1 * self.n_z + z1
-                idx2 = x2 * (self.n_y * self.n_z) + y2 * self.n_z + z2
+        self.positions = [position for position in self.positions if position in keep]
 
-                dist = self.grid.get_distance(idx1, idx2, mic=True)
-                if dist > cutoff:
-                    continue
 
-                for i, j in combinations_with_replacement(range(self.lower,self.k), 2):
-                    rad_1 = radii[i - self.lower]
-                    rad_2 = radii[j - self.lower]
+    def restrict_domain(self, x, y, z, atom_ids, system = "int", pos_rounding = "int"):
+        """
+        Restricts the atom types that may occupy a position (x, y, z) to the given ones.
+        Variables of the excluded types are left out of every clause added afterwards, so restricting domains
+        before initialise() keeps the CNF proportional to the remaining search space.
+        Clauses added earlier may mention the excluded variables, so they are then also forced false.
+
+        :param x: x-coordinate of the position
+        :param y: y-coordinate of the position
+        :param z: z-coordinate of the position
+        :param atom_ids: atom type IDs still allowed at the position
+        :param system: specifies the coordinate system to use
+        :param pos_rounding: when typing in invalid cartesian/ fractional coordinates, this parameter specifies how to round them
+        :return:
+        """
+        x_int, y_int, z_int = self.to_int(x,y,z,system=system,pos_rounding=pos_rounding)
+        allowed = set(atom_ids)
+        domain = tuple(atom_id for atom_id in self.position_domain(x_int, y_int, z_int) if atom_id in allowed)
+
+        if self.grab_hard_clauses():
+            for atom_id in self.site_types(x_int, y_int, z_int):
+                if atom_id not in allowed:
+                    self.cnf.append([-self.encode_var(x_int, y_int, z_int, atom_id)])
 
-                    if dist < rad_1 + rad_2:
-                        self.cnf.append([-self.encode_var(x1, y1, z1, i),
-                                         -self.encode_var(x2, y2, z2, j)])
-                        if i != j:
-                            self.cnf.append([-self.encode_var(x1, y1, z1, j),
-                                            -self.encode_var(x2, y2, z2, i)])
+        self.domains[(x_int, y_int, z_int)] = domain
 
 
     def fill_unit_cell(self):
@@ -55,11 +143,9 @@ class ConstraintsMixin:
         Forces solver to fill all positions in the unit cell with atom types.
         :return:
         """
-        for x in range(self.n_x):
-            for y in range(self.n_y):
-                for z in range(self.n_z):
-                    types = self.get_types(x, y, z)
-                    self.cnf.append(types)
+        for x, y, z in self.positions:
+            types = self.get_types(x, y, z)
+            self.cnf.append(types)
 
 
 
@@ -76,12 +162,15 @@ class ConstraintsMixin:
         :return:
         """
         x_int, y_int, z_int = self.to_int(x,y,z,system=system,pos_rounding=pos_rounding)
+        self.activate_types([atom_id])
+        if atom_id not in self.site_types(x_int, y_int, z_int):
+            raise ValueError(f"Atom type {atom_id} is not in the domain of position ({x_int}, {y_int}, {z_int}).")
         self.cnf.append([self.encode_var(x_int, y_int, z_int, atom_id)])
 
 
     def forbid_atom_at_position(self, x,y,z,atom_id,system = "int",pos_rounding = "int"):
         """
-        Forbids a specific atom type from occupying a given position (x, y, z).
+        Forbids a specific atom type from occupying a given position (x, y, z), by removing it from the position's domain.
 
         :param x: x-coordinate of the position
         :param y: y-coordinate of the position
@@ -92,7 +181,8 @@ class ConstraintsMixin:
         :return:
         """
         x_int, y_int, z_int = self.to_int(x,y,z,system=system,pos_rounding=pos_rounding)
-        self.cnf.append([-self.encode_var(x_int,y_int,z_int,atom_id)])
+        domain = [t for t in self.position_domain(x_int, y_int, z_int) if t != atom_id]
+        self.restrict_domain(x_int, y_int, z_int, domain)
 
 
     def require_one_of_types_at_position(self, x,y,z,atom_ids, system = "int", pos_rounding = "int"):
@@ -109,7 +199,9 @@ class ConstraintsMixin:
         """
 
         x_int, y_int, z_int = self.to_int(x,y,z,system=system,pos_rounding=pos_rounding)
-        vars = [self.encode_var(x_int,y_int,z_int,atom_id) for atom_id in atom_ids]
+        self.activate_types(atom_ids)
+        domain = self.site_types(x_int, y_int, z_int)
+        vars = [self.encode_var(x_int,y_int,z_int,atom_id) for atom_id in atom_ids if atom_id in domain]
         self.cnf.append(vars)
 
 
@@ -125,5 +217,7 @@ class ConstraintsMixin:
         :param pos_rounding: when typing in invalid cartesian/ fractional coordinates, this parameter specifies how to round them
         :return:
         """
-        for atom_id in atom_ids:
-            self.forbid_atom_at_position(x,y,z,atom_id, system = system, pos_rounding = pos_rounding)
+        x_int, y_int, z_int = self.to_int(x,y,z,system=system,pos_rounding=pos_rounding)
+        forbidden = set(atom_ids)
+        domain = [t for t in self.position_domain(x_int, y_int, z_int) if t not in forbidden]
+        self.restrict_domain(x_int, y_int, z_int, domain)
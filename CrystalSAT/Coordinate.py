@@ -1,7 +1,3 @@
-from math import *
-from numpy import *
-
-
 class CoordinateMixin:
 
     def to_int(self, x, y, z, system = "int", pos_rounding="int"):
@@ -18,76 +14,10 @@ class CoordinateMixin:
         """
         x_int = y_int = z_int = None
 
-        if system == "frac":
-
-            max_frac_x = (self.n_x - 1) / self.n_x
-            max_frac_y = (self.n_y - 1) / self.n_y
-            max_frac_z = (self.n_z - 1) / self.n_z
-
-            if not 0 <=x < 1 or not 0<= y < 1 or not 0<= z < 1:
-
-                raise ValueError(f"Fractional coordinates ({x}, {y}, {z}) must be between 0 and 1")
-
-            else:
-
-                x = min(x, max_frac_x)
-                y = min(y, max_frac_y)
-                z = min(z, max_frac_z)
-
-                if pos_rounding == "floor":
-
-                    x_int = int(x * self.n_x)
-                    y_int = int(y * self.n_y)
-                    z_int = int(z * self.n_z)
-
-                elif pos_rounding == "ceil":
-
-                    x_int = int(ceil(x * self.n_x))
-                    y_int = int(ceil(y * self.n_y))
-                    z_int = int(ceil(z * self.n_z))
-
-                elif pos_rounding == "round":
-
-                    x_int = int(round(x * self.n_x))
-                    y_int = int(round(y * self.n_y))
-                    z_int = int(round(z * self.n_z))
-                else:
-
-                    raise ValueError("Unsupported rounding type")
+        if system in ("frac", "cart"):
 
-        elif system == "cart":
-
-            if not (0 <= x < self.a and 0 <= y < self.b and 0 <= z < self.c):
-                raise ValueError(
-                    f"Cartesian coordinates ({x}, {y}, {z}) must be within the unit cell dimensions ({self.a}, {self.b}, {self.c})")
-
-            else:
-
-                dx = self.a / self.n_x
-                dy = self.b / self.n_y
-                dz = self.c / self.n_z
-                max_cart_x = (self.n_x - 1) * dx
-                max_cart_y = (self.n_y - 1) * dy
-                max_cart_z = (self.n_z - 1) * dz
-
-                x = min(x, max_cart_x)
-                y = min(y, max_cart_y)
-                z = min(z, max_cart_z)
-
-                if pos_rounding == "floor":
-                    x_int = int(x/ dx)
-                    y_int = int(y / dy)
-                    z_int = int(z / dz)
-
-                elif pos_rounding == "ceil":
-                    x_int = int(ceil(x / dx))
-                    y_int = int(ceil(y / dy))
-                    z_int = int(ceil(z / dz))
-
-                elif pos_rounding == "round":
-                    x_int = int(round(x / dx))
-                    y_int = int(round(y / dy))
-                    z_int = int(round(z / dz))
+            # cartesian positions are taken back to fractional coordinates through the cell matrix, so oblique cells are handled
+            x_int, y_int, z_int = self.to_int_array([(x, y, z)], system=system, pos_rounding=pos_rounding)[0].tolist()
 
         elif system == "int" or pos_rounding == "int":
 
@@ -113,7 +43,12 @@ class CoordinateMixin:
         :return: tuple coordinates
         """
 
-        if system == "frac":
+        if self.sites is not None:
+
+            x_int, y_int, z_int = self.to_int(x, y, z, system, pos_rounding)
+            x_frac, y_frac, z_frac = self.sites[x_int].tolist()
+
+        elif system == "frac":
 
             x_int, y_int, z_int = self.to_int(x, y, z, system=system, pos_rounding=pos_rounding)
             x_frac = x_int / self.n_x
@@ -143,13 +78,145 @@ class CoordinateMixin:
         :return: x,y,z in cartesian coordinates
         """
 
-        dx = self.a / self.n_x
-        dy = self.b / self.n_y
-        dz = self.c / self.n_z
-
         x_int, y_int, z_int = self.to_int(x, y, z, system = system , pos_rounding = pos_rounding)
-        x_cart = x_int * dx
-        y_cart = y_int * dy
-        z_cart = z_int * dz
+        x_frac, y_frac, z_frac = self.to_frac(x_int, y_int, z_int)
+        x_cart, y_cart, z_cart = self.cell.cartesian_positions([(x_frac, y_frac, z_frac)])[0].tolist()
 
         return x_cart, y_cart, z_cart
+
+    def nearest_site(self, x, y, z, system="frac"):
+        """
+        Finds the candidate site at a fractional or cartesian position (sparse models only).
+        :param x: fractional/cartesian x-coordinate
+        :param y: fractional/cartesian y-coordinate
+        :param z: fractional/cartesian z-coordinate
+        :param system: coordinate system of the input ("frac" or "cart")
+        :return: int tuple (i, 0, 0) of the site
+        """
+        i = int(self.nearest_sites([(x, y, z)], system=system)[0, 0])
+
+        return i, 0, 0
+
+    def to_int_array(self, coords, system="int", pos_rounding="int"):
+        """
+        Converts an array of fractional or cartesian coordinates to integer coordinates in one pass.
+        Cartesian coordinates are taken through the cell matrix, so oblique cells are handled;
+        rounding follows to_int.
+        :param coords: array-like of shape (m, 3)
+        :param system: coordinate system of the input ("int", "frac" or "cart")
+        :param pos_rounding: how to round fractional positions ("floor", "ceil", or "round")
+        :return: int numpy array of shape (m, 3)
+        """
+        import numpy as np
+
+        coords = np.asarray(coords).reshape(-1, 3)
+        n = np.array([self.n_x, self.n_y, self.n_z])
+
+        if system == "int":
+
+            if len(coords) and not np.issubdtype(coords.dtype, np.integer):
+                raise ValueError("Integer coordinates must be provided as integers")
+            outside = ((coords < 0) | (coords >= n)).any(axis=1)
+            if outside.any():
+                raise ValueError(f"Integer coordinates {tuple(coords[outside][0].tolist())} are not within the grid dimensions ({self.n_x}, {self.n_y}, {self.n_z})")
+            return coords.astype(int)
+
+        if system not in ("frac", "cart"):
+            raise ValueError(f"Unsupported coordinate system {system}")
+
+        if self.sites is not None:
+            return self.nearest_sites(coords, system=system)
+
+        frac = self.cart_to_frac_array(coords) if system == "cart" else coords.astype(float)
+        outside = ((frac < 0) | (frac >= 1)).any(axis=1)
+        if outside.any():
+            name = "Fractional" if system == "frac" else "Cartesian"
+            raise ValueError(f"{name} coordinates {tuple(coords[outside][0].tolist())} must lie within the unit cell")
+
+        # grid positions themselves must not be moved by floating-point noise in frac * n
+        scaled = np.round(np.minimum(frac, (n - 1) / n) * n, 9)
+
+        if pos_rounding == "floor":
+            scaled = np.floor(scaled)
+        elif pos_rounding == "ceil":
+            scaled = np.ceil(scaled)
+        elif pos_rounding == "round":
+            scaled = np.rint(scaled)
+        else:
+            raise ValueError("Unsupported rounding type")
+
+        return scaled.astype(int)
+
+    def to_frac_array(self, coords, system="int", pos_rounding="int"):
+        """
+        Converts an array of coordinates to the fractional coordinates of their grid positions (or candidate sites).
+        :param coords: array-like of shape (m, 3)
+        :param system: coordinate system of the input ("int", "frac" or "cart")
+        :param pos_rounding: how to round fractional positions ("floor", "ceil", or "round")
+        :return: float numpy array of shape (m, 3)
+        """
+        import numpy as np
+
+        ints = self.to_int_array(coords, system=system, pos_rounding=pos_rounding)
+        if self.sites is not None:
+            return self.sites[ints[:, 0]]
+
+        return ints / np.array([self.n_x, self.n_y, self.n_z])
+
+    def to_cart_array(self, coords, system="int", pos_rounding="int"):
+        """
+        Converts an array of coordinates to the cartesian coordinates of their grid positions (or candidate sites).
+        :param coords: array-like of shape (m, 3)
+        :param system: coordinate system of the input ("int", "frac" or "cart")
+        :param pos_rounding: how to round fractional positions ("floor", "ceil", or "round")
+        :return: float numpy array of shape (m, 3) in Å
+        """
+        return self.to_frac_array(coords, system=system, pos_rounding=pos_rounding) @ self.cell.array
+
+    def cart_to_frac_array(self, cart):
+        """
+        Converts cartesian coordinates to fractional coordinates through the inverse cell matrix, without snapping to the grid.
+        Values are rounded to 12 decimals so points on a cell face are not pushed outside by floating-point noise.
+        :param cart: array-like of shape (m, 3) in Å
+        :return: float numpy array of shape (m, 3)
+        """
+        import numpy as np
+
+        return np.round(self.cell.scaled_positions(np.asarray(cart, dtype=float).reshape(-1, 3)), 12) + 0.0
+
+    def nearest_sites(self, coords, system="frac", chunk=262144):
+        """
+        Finds the candidate site at each of an array of fractional or cartesian positions (sparse models only).
+        :param coords: array-like of shape (m, 3)
+        :param system: coordinate system of the input ("frac" or "cart")
+        :param chunk: maximum number of point-site pairs searched at once, bounding the memory used
+        :return: int numpy array of shape (m, 3) with rows (i, 0, 0)
+        """
+        import numpy as np
+        from ase.geometry import find_mic
+
+        if system == "cart":
+            points = self.cart_to_frac_array(coords)
+        elif system == "frac":
+            points = np.asarray(coords, dtype=float).reshape(-1, 3)
+        else:
+            raise ValueError(f"Unsupported coordinate system {system}")
+
+        n_sites = len(self.sites)
+        rows = max(1, chunk // n_sites)
+        result = np.zeros((len(points), 3), dtype=int)
+
+        for start in range(0, len(points), rows):
+            block = points[start:start + rows]
+            offsets = (self.sites[None, :, :] - block[:, None, :]).reshape(-1, 3) @ self.cell.array
+            _, distances = find_mic(offsets, self.cell, pbc=True)
+            distances = distances.reshape(len(block), n_sites)
+
+            nearest = distances.argmin(axis=1)
+            too_far = distances[np.arange(len(block)), nearest] > self.site_tolerance
+            if too_far.any():
+                x, y, z = np.asarray(coords, dtype=float).reshape(-1, 3)[start + int(too_far.argmax())].tolist()
+                raise ValueError(f"No candidate site within {self.site_tolerance} Å of ({x}, {y}, {z}) ({system}).")
+            result[start:start + len(block), 0] = nearest
+
+        return result
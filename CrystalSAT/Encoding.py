@@ -1,6 +1,7 @@
 
-import periodictable
-import json
+from itertools import combinations
+
+from .Cache import ion_registry, atomic_number, element_symbol
 
 class EncodingMixin:
 
@@ -11,7 +12,7 @@ class EncodingMixin:
         :param symbol: Element symbol (e.g., 'H', 'O', 'Fe')
         :return: Atomic number of the element (int)
         """
-        return periodictable.elements.symbol(symbol).number
+        return atomic_number(symbol)
 
 
     def populate_ion_dict(self):
@@ -19,21 +20,9 @@ class EncodingMixin:
         Populates the ion dictionary with elements and their charges from the Shannon radii data.
         :return:
         """
-        idx = 119
-        with open("CrystalSATv2/shannon-radii.json") as fp:
-            shannon_data = json.load(fp)
-
-        for symbol, charges in shannon_data.items():
-            for charge_str, cn_dict in charges.items():
-                try:
-                    charge = int(charge_str)
-                except ValueError:
-                    continue
-                for cn_str in cn_dict.keys():
-                    self.ion_dict[idx] = (symbol, charge, cn_str)
-                    self.reverse_ion_dict[(symbol, charge, cn_str)] = idx
-
-                    idx+=1
+        ion_dict, reverse_ion_dict = ion_registry()
+        self.ion_dict.update(ion_dict)
+        self.reverse_ion_dict.update(reverse_ion_dict)
 
 
     def atom_id(self,symbol,charge = 0,cn = None):
@@ -80,6 +69,61 @@ class EncodingMixin:
 
 
 
+    def activate(self, *species):
+        """
+        Activates atom types in lazy mode, creating their exclusivity, packing and other distance clauses.
+        Constraints activate the types they refer to, so this is only needed for types that no constraint mentions.
+        :param species: atom symbols (e.g. "O"), ions as (symbol, charge, cn) tuples, or atom type IDs
+        :return: list of the atom type IDs
+        """
+        atom_ids = []
+        for particle in species:
+            if isinstance(particle, tuple):
+                atom_ids.append(self.atom_id(*particle))
+            elif isinstance(particle, str):
+                atom_ids.append(self.atom_id(particle))
+            else:
+                atom_ids.append(particle)
+
+        self.activate_types(atom_ids)
+        return atom_ids
+
+
+    def activate_types(self, atom_ids):
+        """
+        Adds atom types to the active types and extends the clauses already in the model to cover them.
+        Does nothing outside lazy mode, where all types are always active.
+        :param atom_ids: atom type IDs
+        :return:
+        """
+        if not self.lazy:
+            return
+
+        new = {atom_id for atom_id in atom_ids if atom_id not in self.all_types}
+        if not new:
+            return
+
+        for atom_id in new:
+            if not self.lower <= atom_id < self.k:
+                raise ValueError(f"Atom ID {atom_id} is out of bounds.")
+
+        self.all_types = tuple(sorted(set(self.all_types) | new))
+
+        # exclusivity between the new types and the types already present at each position
+        if self.exclusive and self.native_cardinality:
+            # the new at-most-one over the whole domain implies the earlier, smaller one
+            for x, y, z in self.positions:
+                types = self.site_types(x, y, z)
+                if any(atom_id in new for atom_id in types):
+                    self.add_atmost([self.encode_var(x, y, z, atom_id) for atom_id in types], 1)
+        elif self.exclusive:
+            self.add_binary_clauses([-self.encode_var(x, y, z, i), -self.encode_var(x, y, z, j)]
+                                    for x, y, z in self.positions
+                                    for i, j in combinations(self.site_types(x, y, z), 2) if i in new or j in new)
+
+        self.refresh_distance_constraints()
+
+
     def inverse_id(self, atom_id):
         """
         Converts an atom type ID back to its symbol or ion representation.
@@ -97,7 +141,7 @@ class EncodingMixin:
             else:
                 if (1<= atom_id <= 118):
 
-                    return periodictable.elements[atom_id].symbol
+                    return element_symbol(atom_id)
 
                 elif (119<= atom_id <= self.k):
 
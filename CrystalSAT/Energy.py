@@ -0,0 +1,106 @@
+import heapq
+from itertools import count, islice
+
+from .Cache import pair_kernels
+
+# e^2 / (4 pi epsilon_0) in eV Å
+COULOMB_CONSTANT = 14.399645
+
+
+class EnergyMixin:
+
+    def score_solutions(self, solutions, cutoff=10.0, alpha=0.2, repulsion=1.0, rho=0.3, charges=None):
+        """
+        Scores solutions with a fast pairwise energy proxy, to rank them before expensive relaxations.
+        The proxy is a point-charge Coulomb energy, summed with the damped shifted (Wolf) method over all periodic
+        images within the cutoff, plus a Born-Mayer repulsion repulsion * exp((r_a + r_b - d) / rho) between every
+        two atoms, using their radii. Both terms are quadratic forms over the site occupancies, so a whole batch
+        is scored with a few matrix products.
+        :param solutions: list of models
+        :param cutoff: cutoff distance (Å) of both terms
+        :param alpha: Wolf damping parameter (1/Å)
+        :param repulsion: prefactor of the repulsion (eV)
+        :param rho: decay length of the repulsion (Å)
+        :param charges: optional dict atom type ID -> charge; ions default to their charge, atoms to 0
+        :return: float numpy array of energies (eV per cell), one per solution
+        """
+        import math
+        import numpy as np
+
+        solutions = list(solutions)
+        if not solutions:
+            return np.zeros(0)
+
+        occupancy = np.array([self.occupancy(solution) for solution in solutions])
+        cellpar = (self.a, self.b, self.c, self.alpha, self.beta, self.gamma)
+        coulomb, born_mayer = pair_kernels(self.n_x, self.n_y, self.n_z, cellpar, self._sites_key, cutoff, alpha, rho)
+
+        # per-type charge and repulsion weight exp(r / rho); the last entry stands for an empty position
+        q = np.zeros(self.k + 1)
+        w = np.zeros(self.k + 1)
+        for atom_id in np.unique(occupancy[occupancy >= 0]).tolist():
+            particle = self.inverse_id(atom_id)
+            if charges is not None and atom_id in charges:
+                q[atom_id] = charges[atom_id]
+            elif isinstance(particle, tuple):
+                q[atom_id] = particle[1]
+            radius = self.get_radius(*particle) if isinstance(particle, tuple) else self.get_radius(particle)
+            w[atom_id] = math.exp(radius / rho)
+
+        site_q = q[occupancy]
+        site_w = w[occupancy]
+
+        self_energy = math.erfc(alpha * cutoff) / (2 * cutoff) + alpha / math.sqrt(math.pi)
+        e_coulomb = 0.5 * self._pair_sum(site_q, coulomb) - self_energy * (site_q ** 2).sum(axis=1)
+        e_repulsion = 0.5 * self._pair_sum(site_w, born_mayer)
+
+        return COULOMB_CONSTANT * e_coulomb + repulsion * e_repulsion
+
+
+    def _pair_sum(self, values, kernel):
+        """
+        Computes sum_ij v_i v_j K_ij for each row of values.
+        On a grid the kernel is one value per periodic offset, so the sum is taken over the autocorrelation of the
+        values, computed with an FFT, instead of a full n_sites x n_sites matrix.
+        :param values: float numpy array of shape (n_solutions, n_sites)
+        :param kernel: kernel returned by pair_kernels()
+        :return: float numpy array of shape (n_solutions,)
+        """
+        import numpy as np
+
+        if self.sites is not None:
+            return np.einsum("ij,ij->i", values @ kernel, values)
+
+        grid = (self.n_x, self.n_y, self.n_z)
+        spectrum = np.fft.rfftn(values.reshape(-1, *grid), axes=(1, 2, 3))
+        # correlation[offset] = sum_i v_i v_(i + offset)
+        correlation = np.fft.irfftn(spectrum.conj() * spectrum, s=grid, axes=(1, 2, 3))
+        return correlation.reshape(len(values), -1) @ kernel
+
+
+    def rank_solutions(self, solutions, n_best=10, batch_size=1024, **energy_options):
+        """
+        Scores a stream of solutions in batches and keeps the n_best lowest energies in a heap, so any number of
+        solutions (e.g. iter_solutions() or iter_samples()) can be screened in constant memory.
+        :param solutions: iterable of models
+        :param n_best: number of solutions to keep
+        :param batch_size: number of solutions scored together
+        :param energy_options: cutoff, alpha, repulsion, rho and charges, see score_solutions()
+        :return: list of (energy, solution) pairs, lowest energy first
+        """
+        solutions = iter(solutions)
+        order = count()
+        heap = []  # (-energy, order, solution), so heap[0] is the worst solution kept
+
+        while True:
+            batch = list(islice(solutions, batch_size))
+            if not batch:
+                break
+
+            for energy, solution in zip(self.score_solutions(batch, **energy_options).tolist(), batch):
+                if len(heap) < n_best:
+                    heapq.heappush(heap, (-energy, next(order), solution))
+                elif -energy > heap[0][0]:
+                    heapq.heapreplace(heap, (-energy, next(order), solution))
+
+        return [(-energy, solution) for energy, _, solution in sorted(heap, reverse=True)]
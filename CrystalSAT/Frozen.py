@@ -0,0 +1,264 @@
+import hashlib
+
+from .Cardinality import CardinalityMixin
+from .Checkpoint import CheckpointMixin
+from .Sampling import SamplingMixin
+from .SolveAndExport import SolveAndExportMixin
+
+
+# arrays of a frozen model, in the order they are laid out in shared memory
+_ARRAYS = ("clauses", "atmosts", "site_mask", "frac", "old_vars", "fixed")
+
+
+class FreezeMixin:
+
+    def freeze(self):
+        """
+        Compiles the model into a FrozenModel: the clauses and at-most constraints loaded into the solver
+        (after presolve(), if it was called) as flat buffers, the grid and the species table.
+        The frozen model pickles quickly or can be placed in shared memory, and can solve, enumerate, sample
+        and decode without the ASE grid, the variable dictionaries or the CNF of the model.
+        Later changes to the model do not affect it.
+        :return: FrozenModel
+        """
+        import numpy as np
+
+        n_sites = self.n_x * self.n_y * self.n_z
+
+        # each clause followed by 0, each at-most constraint as its literals, 0 and the bound
+        clauses = np.fromiter((lit for clause in self.solver_clauses() for lit in (*clause, 0)), dtype=np.int32)
+        atmosts = np.fromiter((lit for lits, bound in self.solver_atmosts() for lit in (*lits, 0, bound)), dtype=np.int32)
+
+        site_mask = np.zeros(self.max_real + 1, dtype=bool)
+        for site, (x, y, z) in enumerate(self.valid_positions):
+            types = np.fromiter(self.site_types(x, y, z), dtype=np.int64)
+            site_mask[site * self.k + types + 1] = True
+
+        if self.presolved is None:
+            old_vars, fixed = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        else:
+            old_vars = np.array(self.presolved["old_vars"], dtype=np.int64)
+            fixed = np.array(self.presolved["fixed"], dtype=np.int64)
+
+        species = [None] * self.k
+        for atom_id in range(self.lower, self.k):
+            species[atom_id] = self.inverse_id(atom_id)
+
+        meta = {
+            "n_x": self.n_x, "n_y": self.n_y, "n_z": self.n_z, "k": self.k,
+            "cellpar": [self.a, self.b, self.c, self.alpha, self.beta, self.gamma],
+            "allowed": list(self.allowed),
+            "species": species,
+            "presolved": self.presolved is not None,
+            "top_id": self.solver_top_id(),
+        }
+        arrays = {
+            "clauses": clauses,
+            "atmosts": atmosts,
+            "site_mask": site_mask,
+            "frac": self.to_frac_array(self.valid_positions).reshape(n_sites, 3),
+            "old_vars": old_vars,
+            "fixed": fixed,
+        }
+        return FrozenModel(meta, arrays)
+
+
+class FrozenModel(SolveAndExportMixin, CheckpointMixin, SamplingMixin):
+    """
+    Immutable compiled form of a CrystalSAT model, see CrystalSAT.freeze().
+    Solve, enumeration, sampling, checkpoint and export methods work as on the model; the arrays are read-only.
+    """
+
+    _load_atmosts = CardinalityMixin._load_atmosts
+    encode_atmosts = CardinalityMixin.encode_atmosts
+
+    def __init__(self, meta, arrays, shm=None):
+        self.meta = meta
+        self.n_x, self.n_y, self.n_z, self.k = meta["n_x"], meta["n_y"], meta["n_z"], meta["k"]
+        self.allowed = meta["allowed"]
+        self.species = meta["species"]
+        self.max_real = self.n_x * self.n_y * self.n_z * self.k
+
+        for name in _ARRAYS:
+            arrays[name].setflags(write=False)
+            setattr(self, name, arrays[name])
+
+        self.status = None
+        self.progress = None
+        self._cell = None
+        self._shm = shm
+
+
+    def __getstate__(self):
+        # the arrays are copied into the pickle, a shared memory block is not
+        state = self.__dict__.copy()
+        state["_shm"] = None
+        state["_cell"] = None
+        return state
+
+
+    @property
+    def cell(self):
+        """
+        ASE cell of the model's cell parameters.
+        """
+        if self._cell is None:
+            from ase.cell import Cell
+
+            self._cell = Cell.fromcellpar(self.meta["cellpar"])
+        return self._cell
+
+
+    def solver_clauses(self):
+        """
+        Gets the clauses loaded into the solver.
+        :return: list of clauses
+        """
+        import numpy as np
+
+        lits = self.clauses.tolist()
+        ends = np.flatnonzero(self.clauses == 0).tolist()
+        return [lits[start:end] for start, end in zip([0] + [end + 1 for end in ends[:-1]], ends)]
+
+
+    def solver_atmosts(self):
+        """
+        Gets the at-most constraints loaded into the solver.
+        :return: list of (lits, bound) pairs
+        """
+        values = self.atmosts.tolist()
+        atmosts = []
+        start = 0
+        while start < len(values):
+            # literals are never 0, so the first 0 ends the literals and the bound follows it
+            end = values.index(0, start)
+            atmosts.append((values[start:end], values[end + 1]))
+            start = end + 2
+        return atmosts
+
+
+    def solver_top_id(self):
+        return self.meta["top_id"]
+
+
+    def expand_model(self, model):
+        """
+        Maps a model of the solver back to the variables of the model the frozen model was compiled from.
+        """
+        if not self.meta["presolved"] or model is None:
+            return model
+
+        old_vars = self.old_vars.tolist()
+        expanded = self.fixed.tolist()
+        for lit in model:
+            if abs(lit) <= len(old_vars):
+                var = old_vars[abs(lit) - 1]
+                expanded.append(var if lit > 0 else -var)
+        return sorted(expanded, key=abs)
+
+
+    def original_var(self, var):
+        if not self.meta["presolved"]:
+            return var
+        return int(self.old_vars[var - 1]) if var <= len(self.old_vars) else None
+
+
+    def is_site_var(self, var):
+        return var is not None and 0 < var <= self.max_real and bool(self.site_mask[var])
+
+
+    def model_hash(self):
+        """
+        Same fingerprint as CrystalSAT.model_hash() of the model the frozen model was compiled from,
+        so checkpoints can be shared between the two.
+        :return: hex digest
+        """
+        import numpy as np
+
+        digest = hashlib.sha256()
+        digest.update(repr((self.n_x, self.n_y, self.n_z, self.k, list(self.allowed))).encode())
+        digest.update(self.clauses.astype(np.int64).tobytes())
+        digest.update(self.atmosts.astype(np.int64).tobytes())
+        if self.meta["presolved"]:
+            digest.update(np.concatenate([self.old_vars, [0], self.fixed]).astype(np.int64).tobytes())
+        return digest.hexdigest()
+
+
+    def decode_solution(self, solution, system_output="int"):
+        """
+        Decodes a solution into a list of (x, y, z, atom_symbol) entries, as CrystalSAT.decode_solution().
+        :param solution: List of integers representing the SAT solution
+        :param system_output: coordinate system of the positions ("int", "frac" or "cart")
+        :return: list of (x, y, z, atom_symbol)
+        """
+        sites = []
+        labels = []
+        for var in solution:
+            if self.is_site_var(var):
+                sites.append((var - 1) // self.k)
+                labels.append(self.species[(var - 1) % self.k])
+
+        if system_output == "int":
+            positions = [(site // (self.n_y * self.n_z), site // self.n_z % self.n_y, site % self.n_z) for site in sites]
+        elif system_output == "frac":
+            positions = self.frac[sites].tolist()
+        elif system_output == "cart":
+            positions = (self.frac[sites] @ self.cell.array).tolist()
+        else:
+            raise ValueError(f"Unsupported coordinate system {system_output}")
+
+        return [(x, y, z, label) for (x, y, z), label in zip(positions, labels)]
+
+
+    def share(self):
+        """
+        Copies the arrays into one shared memory block, which stays allocated until unshare() is called.
+        :return: small picklable handle; FrozenModel.attach(handle) opens the model in another process without copying
+        """
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        layout = []
+        offset = 0
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // 8) * 8
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 8))
+        for name, dtype, shape, start in layout:
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)[...] = getattr(self, name)
+
+        return {"name": self._shm.name, "layout": layout, "meta": self.meta}
+
+
+    def unshare(self):
+        """
+        Frees the shared memory block of share(). Models attached in other processes must not be used afterwards.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+    @classmethod
+    def attach(cls, handle):
+        """
+        Opens a frozen model placed in shared memory by share(); the arrays are read from the shared block directly.
+        :param handle: handle returned by share()
+        :return: FrozenModel
+        """
+        import numpy as np
+        from multiprocessing import shared_memory
+
+        try:
+            shm = shared_memory.SharedMemory(name=handle["name"], track=False)
+        except TypeError:
+            # before Python 3.13 the block is also registered with the resource tracker, which child processes
+            # share with the process that created it, so it is still only freed by unshare()
+            shm = shared_memory.SharedMemory(name=handle["name"])
+
+        arrays = {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+                  for name, dtype, shape, start in handle["layout"]}
+        return cls(handle["meta"], arrays, shm=shm)
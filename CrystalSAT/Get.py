@@ -1,6 +1,7 @@
 
-import json
-from mendeleev import element
+from collections import Counter
+
+from .Cache import shannon_data, element_radius, ion_radius
 
 class GetMixin:
 
@@ -13,6 +14,7 @@ class GetMixin:
         return [
             self.encode_var(x, y, z, atom_id)
             for x,y,z in self.positions
+            if atom_id in self.site_types(x, y, z)
         ]
 
     def get_types(self, x, y, z, system = "int", pos_rounding = "int"):
@@ -27,7 +29,54 @@ class GetMixin:
         """
 
         x_int, y_int, z_int = self.to_int(x, y, z, system, pos_rounding)
-        return [self.encode_var(x_int, y_int, z_int, t) for t in range(self.lower,self.k)]
+        return [self.encode_var(x_int, y_int, z_int, t) for t in self.site_types(x_int, y_int, z_int)]
+
+    def site_types(self, x, y, z):
+        """
+        Grabs the atom type IDs that may occupy a position: its domain, limited to the active types.
+        Variables of other types at this position are never used in any clause.
+        :param x: x-coordinate (integer)
+        :param y: y-coordinate (integer)
+        :param z: z-coordinate (integer)
+        :return: sequence of atom type IDs
+        """
+        domain = self.domains.get((x, y, z))
+        if domain is None:
+            return self.all_types
+        if self.lazy:
+            return tuple(t for t in domain if t in self.all_types)
+        return domain
+
+    def position_domain(self, x, y, z):
+        """
+        Grabs the domain of a position, including types that are not active yet.
+        :param x: x-coordinate (integer)
+        :param y: y-coordinate (integer)
+        :param z: z-coordinate (integer)
+        :return: sequence of atom type IDs
+        """
+        return self.domains.get((x, y, z), range(self.lower, self.k))
+
+    def is_site_var(self, var):
+        """
+        Checks whether a variable is a (position, type) variable within the domain of its position.
+        :param var: variable ID
+        :return: bool
+        """
+        if var is None or not 0 < var <= self.max_real or var not in self.var_dict:
+            return False
+        x, y, z, _ = self.var_dict[var]
+        return (var - 1) % self.k in self.site_types(x, y, z)
+
+    def get_clause_stats(self):
+        """
+        Grabs the number of binary clauses in the model and of those skipped while building it,
+        as duplicates of a clause already added or as implied by a unit clause.
+        :return: dict with keys "binary", "duplicates" and "subsumed"
+        """
+        dropped = sum(self.dropped_distance.values(), Counter(self.dropped_binaries))
+        return {"binary": len(self.binary_clauses) + len(self.distance_binaries),
+                "duplicates": dropped["duplicates"], "subsumed": dropped["subsumed"]}
 
     @staticmethod
     def get_ions(symbol):
@@ -37,15 +86,14 @@ class GetMixin:
         :return: ion array of tuples (charge, coordination number)
         """
 
-        with open("shannon-radii.json") as fp:
-            shannon_data = json.load(fp)
+        data = shannon_data()
 
-        if symbol not in shannon_data:
+        if symbol not in data:
             raise KeyError(f"Symbol {symbol} not found in shannon radii database")
 
         ions = []
 
-        for charge_str, cn_dict in shannon_data[symbol].items():
+        for charge_str, cn_dict in data[symbol].items():
             try:
 
                 charge = int(charge_str)
@@ -70,16 +118,7 @@ class GetMixin:
         """
 
         if charge is None and cn is None:
-            el = element(symbol)
-            r = el.vdw_radius
-
-            if r is None:
-                r = el.covalent_radius
-                if r is None:
-                    raise ValueError(f"No radius found for element {symbol}.")
-
-            r_angstrom = r / 100
-            return r_angstrom
+            return element_radius(symbol)
 
         elif charge is not None and cn is not None:
 
@@ -87,17 +126,7 @@ class GetMixin:
             if key not in self.reverse_ion_dict:
                 raise ValueError(f"Symbol {symbol} is not a valid element or does not have a defined radius.Error : {key}")
 
-            with open("CrystalSATv2/shannon-radii.json") as fp:
-                shannon_data = json.load(fp)
-
-            try:
-                r_dict = shannon_data[symbol][str(charge)][cn]
-                r_ionic = r_dict.get("r_ionic")
-                if r_ionic is None:
-                    raise ValueError(f"No Shannon ionic radius found for {key}. ")
-                return r_ionic
-            except KeyError as e:
-                raise ValueError(f"No Shannon ionic radius found for {key}. Error: {e}")
+            return ion_radius(symbol, charge, cn)
 
         else:
             raise ValueError("Either both charge and cn must be specified (ions), or neither (atoms) .")
@@ -110,7 +139,7 @@ class GetMixin:
         """
 
         max_radius = 0.0
-        for i in range(self.lower,self.k):
+        for i in self.all_types:
             particle = self.inverse_id(i)
             if isinstance(particle, tuple):
                 r = self.get_radius(*particle)
@@ -1,5 +1,17 @@
 class GrabMixin:
 
+    def grab_hard_clauses(self):
+        """
+        Gets the hard clauses of the model, whether the CNF is plain or weighted (WCNF).
+        :return: list of hard clauses
+        """
+        if hasattr(self.cnf, "hard") and hasattr(self.cnf, "soft"):
+            # WCNF format
+            return self.cnf.hard
+        else:
+            # CNF format
+            return self.cnf.clauses
+
     def grab_forced(self,atom_id):
 
         """
@@ -8,7 +20,7 @@ class GrabMixin:
         :return: list of forced true variables for a specific atom type
         """
         forced_true_vars = [
-            clause[0] for clause in self.cnf.clauses
+            clause[0] for clause in self.grab_hard_clauses()
             if len(clause) == 1 and clause[0] > 0 and (clause[0] - 1) % self.k == atom_id
 
         ]
@@ -22,7 +34,7 @@ class GrabMixin:
         :return: list of available positions for a specific atom type
         """
         forced_positions = set()
-        for t in range(self.lower,self.k):
+        for t in self.all_types:
             for var in self.grab_forced(t):
 
                 x,y,z,_ = self.var_dict[var]
@@ -0,0 +1,227 @@
+
+import time
+
+from pysat.formula import WCNF
+
+
+class MaxSATMixin:
+
+    def make_weighted(self):
+        """
+        Converts the CNF into a weighted CNF (WCNF) so that soft clauses can be added.
+        All clauses already in the model become hard clauses. Does nothing if the model is already weighted.
+        :return:
+        """
+        if hasattr(self.cnf, "hard") and hasattr(self.cnf, "soft"):
+            return
+
+        wcnf = WCNF()
+        wcnf.extend(self.cnf.clauses)
+        wcnf.nv = max(wcnf.nv, self.cnf.nv)
+        self.cnf = wcnf
+
+
+    def add_soft_clause(self, clause, weight=1):
+        """
+        Adds a soft clause to the model. The solver pays weight for every soft clause it leaves unsatisfied.
+        :param clause: list of literals
+        :param weight: positive cost of violating the clause
+        :return:
+        """
+        if weight <= 0:
+            raise ValueError(f"Soft clause weight must be positive, got {weight}.")
+
+        self.make_weighted()
+        self.cnf.append(list(clause), weight=weight)
+
+
+    def prefer_near(self, atom_id, neighbor_ids, cutoff, tolerance, weight=1, ball=True):
+        """
+        Prefers every atom of one type to have at least one neighbor of the chosen types within a given distance.
+        Each atom of type atom_id without such a neighbor costs weight.
+        :param atom_id: atom type ID that should be near the neighbor types
+        :param neighbor_ids: array [] of preferred neighbor type IDs
+        :param cutoff: cutoff distance (Å) for neighbors
+        :param tolerance: tolerance for distance matching (Å)
+        :param weight: cost of each atom without a preferred neighbor
+        :param ball: if True, counts all neighbors within cutoff + tolerance
+        :return:
+        """
+        self.activate_types([atom_id] + list(neighbor_ids))
+        for x, y, z in self.positions:
+            if atom_id not in self.site_types(x, y, z):
+                continue
+            atom = self.encode_var(x, y, z, atom_id)
+            clause = [-atom]
+            for neighbor_id in neighbor_ids:
+                clause.extend(self.encode_neighbors(x, y, z, atom_id=neighbor_id, cutoff=cutoff, tolerance=tolerance,
+                                                    system="int", pos_rounding="int", ball=ball))
+            self.add_soft_clause(clause, weight=weight)
+
+
+    def prefer_fewer_vacancies(self, weight=1):
+        """
+        Prefers occupied positions. Each empty position in the unit cell costs weight.
+        :param weight: cost of each vacancy
+        :return:
+        """
+        for x, y, z in self.positions:
+            types = self.get_types(x, y, z)
+            if types:
+                self.add_soft_clause(types, weight=weight)
+
+
+    def prefer_composition(self, atom_id, target, weight=1, max_deviation=None):
+        """
+        Prefers a number of atoms of one type close to target.
+        Each atom above or below target costs weight.
+        :param atom_id: atom type ID to count
+        :param target: preferred number of atoms of this type in the unit cell
+        :param weight: cost of each atom of deviation from target
+        :param max_deviation: largest excess above target that is distinguished (defaults to no limit);
+                              larger excesses cost the same as max_deviation, which keeps the encoding small
+        :return:
+        """
+        self.activate_types([atom_id])
+        lits = self.get_positions(atom_id)
+        if not 0 <= target <= len(lits):
+            raise ValueError(f"target {target} must be between 0 and the number of positions {len(lits)} for atom type {atom_id}.")
+
+        cap = None if max_deviation is None else target + max_deviation
+
+        self.make_weighted()
+        counts = self.totalizer(lits, cap=cap)
+
+        # counts[j] is true when at least j + 1 atoms are placed
+        for j, out in enumerate(counts):
+            if j < target:
+                self.add_soft_clause([out], weight=weight)
+            else:
+                self.add_soft_clause([-out], weight=weight)
+
+
+    def solve_weighted(self, solver_name="g3", timeout=None, engine=None):
+        """
+        Solves the weighted problem, minimising the total weight of violated soft clauses.
+        The cost of the returned model is stored in self.cost, and self.optimal tells whether it is proven optimal.
+        :param solver_name: name of the SAT solver used by the MaxSAT engine
+        :param timeout: wall-clock limit in seconds; the best model found so far is returned when it runs out
+        :param engine: "rc2" (core-guided, exact) or "linear" (anytime SAT-UNSAT search);
+                       defaults to "rc2" without a timeout and "linear" with one
+        :return: best model found, None if the hard clauses are unsatisfiable or no model was found in time
+        """
+        self.make_weighted()
+
+        if engine is None:
+            engine = "rc2" if timeout is None else "linear"
+
+        if engine == "rc2":
+            if timeout is not None:
+                raise ValueError("The rc2 engine does not support timeouts, use engine='linear'.")
+            return self._solve_rc2(solver_name)
+
+        elif engine == "linear":
+            deadline = None if timeout is None else time.monotonic() + timeout
+            return self._solve_linear(solver_name, deadline)
+
+        else:
+            raise ValueError(f"Unsupported MaxSAT engine {engine}")
+
+
+    def soft_cost(self, model):
+        """
+        Computes the total weight of soft clauses violated by a model.
+        :param model: list of integers representing the model
+        :return: cost of the model
+        """
+        true_lits = set(model)
+        cost = 0
+        for clause, weight in zip(self.cnf.soft, self.cnf.wght):
+            if not any(lit in true_lits for lit in clause):
+                cost += weight
+        return cost
+
+
+    def _solve_rc2(self, solver_name):
+        """
+        Solves the weighted problem to optimality with RC2.
+        :param solver_name: name of the SAT solver used by RC2
+        :return: optimal model, None if the hard clauses are unsatisfiable
+        """
+        from pysat.examples.rc2 import RC2
+
+        wcnf = self.cnf.copy()
+        if self.atmosts:
+            clauses, _ = self.encode_atmosts(self.atmosts, max(wcnf.nv, self.vpool.top, self.max_real))
+            wcnf.extend(clauses)
+
+        with RC2(wcnf, solver=solver_name) as rc2:
+            model = rc2.compute()
+
+        self.cost = None if model is None else rc2.cost
+        self.optimal = model is not None
+        return model
+
+
+    def _solve_linear(self, solver_name, deadline):
+        """
+        Linear SAT-UNSAT search: every model found tightens an upper bound on the cost until the bound is unsatisfiable.
+        Weights are handled by repeating each selector literal weight times in the cost totalizer, so they must be integers.
+        :param solver_name: name of the SAT solver
+        :param deadline: time.monotonic() value at which the search stops, None for no limit
+        :return: best model found, None if none was found
+        """
+        from pysat.card import ITotalizer
+        from pysat.solvers import Solver
+
+        for weight in self.cnf.wght:
+            if int(weight) != weight:
+                raise ValueError("The linear engine requires integer weights, use engine='rc2'.")
+
+        n_vars = max(self.cnf.nv, self.vpool.top)
+        top = n_vars
+        selectors = []
+
+        self.cost = None
+        self.optimal = False
+        best = None
+        tot = None
+
+        with Solver(name=solver_name, bootstrap_with=self.cnf.hard) as oracle:
+            top = self._load_atmosts(oracle, self.atmosts, top)
+
+            # a true selector relaxes its soft clause
+            for clause in self.cnf.soft:
+                top += 1
+                oracle.add_clause(clause + [top])
+                selectors.append(top)
+
+            while True:
+                is_sat = self._solve_limited(oracle, deadline=deadline)
+                if is_sat is None:
+                    break
+
+                if not is_sat:
+                    # no model below the current bound, so the best one is optimal
+                    self.optimal = best is not None
+                    break
+
+                model = oracle.get_model()
+                best = [lit for lit in model if abs(lit) <= n_vars]
+                self.cost = self.soft_cost(best)
+                if self.cost == 0:
+                    self.optimal = True
+                    break
+
+                if tot is None:
+                    lits = [sel for sel, weight in zip(selectors, self.cnf.wght) for _ in range(int(weight))]
+                    tot = ITotalizer(lits=lits, ubound=self.cost, top_id=top)
+                    oracle.append_formula(tot.cnf.clauses)
+
+                # at most cost - 1 units of weight may be violated from now on
+                oracle.add_clause([-tot.rhs[self.cost - 1]])
+
+        if tot is not None:
+            tot.delete()
+
+        return best
@@ -1,9 +1,130 @@
 
-from ase.neighborlist import NeighborList
+from .Cache import grid_image_counts, grid_offset_distances, site_distances, site_image_counts
 
 
 class NeighborAndDistancesMixin:
 
+    def distance_matrix(self):
+        """
+        Gets the minimum-image distance between every pair of grid positions (or candidate sites).
+        The matrix of candidate sites is shared by all models with the same sites and cell parameters; on a grid it is
+        expanded from the shared offset table on every call, so use pair_distances() for a subset of the pairs.
+        :return: read-only numpy array of shape (n_sites, n_sites), indexed by flattened position
+        """
+        import numpy as np
+
+        if self.sites is not None:
+            cellpar = (self.a, self.b, self.c, self.alpha, self.beta, self.gamma)
+            return site_distances(self._sites_key, cellpar)
+
+        sources = np.arange(self.n_x * self.n_y * self.n_z)
+        distances = self.pair_distances(sources[:, None], sources[None, :])
+        distances.setflags(write=False)
+        return distances
+
+
+    def pair_distances(self, sources, targets):
+        """
+        Gets the minimum-image distances between pairs of positions, without building the full distance matrix on a grid.
+        :param sources: flattened position indices (int or int numpy array)
+        :param targets: flattened position indices, broadcast against sources
+        :return: numpy array of distances (Å)
+        """
+        cellpar = (self.a, self.b, self.c, self.alpha, self.beta, self.gamma)
+        if self.sites is not None:
+            return site_distances(self._sites_key, cellpar)[sources, targets]
+        return grid_offset_distances(self.n_x, self.n_y, self.n_z, cellpar)[self._offset_index(sources, targets)]
+
+
+    def pair_image_counts(self, sources, targets, low, high):
+        """
+        Counts the periodic images of each target at a distance in [low, high] from its source. Unlike the
+        minimum-image distance, this sees a position as often as it appears around the source, e.g. the six O
+        around Ti in a one-formula perovskite cell, which are images of three O sites; a position also sees its own images.
+        :param sources: flattened position indices (int or int numpy array)
+        :param targets: flattened position indices, broadcast against sources
+        :param low: smallest distance counted (Å)
+        :param high: largest distance counted (Å)
+        :return: int numpy array of image counts
+        """
+        cellpar = (self.a, self.b, self.c, self.alpha, self.beta, self.gamma)
+        if self.sites is not None:
+            return site_image_counts(self._sites_key, cellpar, low, high)[sources, targets]
+        return grid_image_counts(self.n_x, self.n_y, self.n_z, cellpar, low, high)[self._offset_index(sources, targets)]
+
+
+    def _offset_index(self, sources, targets):
+        """
+        Gets the flattened periodic grid offset from each source to its target, on which distances on a grid depend.
+        """
+        s_x, s_y, s_z = sources // (self.n_y * self.n_z), (sources // self.n_z) % self.n_y, sources % self.n_z
+        t_x, t_y, t_z = targets // (self.n_y * self.n_z), (targets // self.n_z) % self.n_y, targets % self.n_z
+        return (((t_x - s_x) % self.n_x) * self.n_y + (t_y - s_y) % self.n_y) * self.n_z + (t_z - s_z) % self.n_z
+
+
+    def neighbor_pairs(self, cutoff, tolerance, ball=True):
+        """
+        Finds every ordered pair of distinct positions within a neighbor distance in one vectorized pass.
+        On a rectangular grid the distance only depends on the periodic offset between two positions, so the
+        site-index arrays are shifted by every offset in the neighbor shell at once; candidate sites use the distance matrix.
+        :param cutoff: cutoff distance (Å) for neighbors
+        :param tolerance: tolerance for distance matching (Å)
+        :param ball: if True, pairs within cutoff + tolerance; if False, pairs within [cutoff - tolerance, cutoff + tolerance]
+        :return: (sources, targets) int numpy arrays of flattened position indices
+        """
+        import numpy as np
+
+        def within(d):
+            if ball:
+                return d <= cutoff + tolerance
+            return (cutoff - tolerance <= d) & (d <= cutoff + tolerance)
+
+        if self.sites is not None:
+            mask = within(self.distance_matrix())
+            np.fill_diagonal(mask, False)
+            return mask.nonzero()
+
+        # distance of every offset vector from position 0
+        sources = np.arange(self.n_x * self.n_y * self.n_z)
+        shell = within(self.pair_distances(0, sources))
+        shell[0] = False
+        offsets = shell.nonzero()[0]
+        o_x, o_y, o_z = offsets // (self.n_y * self.n_z), (offsets // self.n_z) % self.n_y, offsets % self.n_z
+
+        i_x, i_y, i_z = sources // (self.n_y * self.n_z), (sources // self.n_z) % self.n_y, sources % self.n_z
+        targets = ((((i_x[:, None] + o_x) % self.n_x) * self.n_y + (i_y[:, None] + o_y) % self.n_y) * self.n_z
+                   + (i_z[:, None] + o_z) % self.n_z)
+
+        return np.repeat(sources, len(offsets)), targets.ravel()
+
+
+    def type_mask(self, atom_ids):
+        """
+        Gets which of the given atom types each position allows, for vectorized clause generation.
+        Positions outside self.positions allow none.
+        :param atom_ids: atom type IDs
+        :return: bool numpy array of shape (n_sites, len(atom_ids)), indexed by flattened position
+        """
+        import numpy as np
+
+        mask = np.zeros((self.n_x * self.n_y * self.n_z, len(atom_ids)), dtype=bool)
+        if not self.positions:
+            return mask
+
+        positions = np.array(self.positions)
+        indices = (positions[:, 0] * self.n_y + positions[:, 1]) * self.n_z + positions[:, 2]
+        mask[indices] = [atom_id in self.all_types for atom_id in atom_ids]
+
+        # positions with a restricted domain
+        for x, y, z in self.domains:
+            idx = (x * self.n_y + y) * self.n_z + z
+            if mask[idx].any():
+                domain = self.site_types(x, y, z)
+                mask[idx] = [atom_id in domain for atom_id in atom_ids]
+
+        return mask
+
+
     def get_distance(self, x1, y1, z1, x2, y2, z2):
 
         """
@@ -21,7 +142,7 @@ class NeighborAndDistancesMixin:
 
         idx1 = x1 * (self.n_y * self.n_z) + y1 * self.n_z + z1
         idx2 = x2 * (self.n_y * self.n_z) + y2 * self.n_z + z2
-        return self.grid.get_distance(idx1, idx2, mic=True)
+        return float(self.pair_distances(idx1, idx2))
 
 
     def get_neighbors(self, x, y, z, cutoff , tolerance, system , pos_rounding, debug = True , ball = True):
@@ -39,6 +160,7 @@ class NeighborAndDistancesMixin:
         :param debug: if True, prints debug information
         :param ball: if True, returns all neighbors within cutoff + tolerance; if False, returns neighbors within [cutoff - tolerance, cutoff + tolerance]
         """
+        import numpy as np
 
         # get corresponding integer coordinates
         x_int, y_int, z_int = self.to_int(x, y, z, system = system , pos_rounding=pos_rounding)
@@ -46,35 +168,25 @@ class NeighborAndDistancesMixin:
         # flatten to int
         idx = x_int * (self.n_y * self.n_z) + y_int * self.n_z + z_int
 
-        # Builds neighbor list (radius per site)
-        radii = [cutoff / 2.0] * len(self.grid)
-        nl = NeighborList(radii, self_interaction=False, bothways=True)
-        nl.update(self.grid)
-
-        # Query neighbors
-        indices, offsets = nl.get_neighbors(idx)
+        # Distances from this site to all others
+        distances = self.pair_distances(idx, np.arange(self.n_x * self.n_y * self.n_z))
+        if ball:
+            within = distances <= cutoff + tolerance
+        else:
+            within = (cutoff - tolerance <= distances) & (distances <= cutoff + tolerance)
+        within[idx] = False
 
         # Unflatten to (x', y', z')
         neighbors = []
-        for i in indices:
+        for i in within.nonzero()[0].tolist():
 
             x2 = i // (self.n_y * self.n_z)
             y2 = (i % (self.n_y * self.n_z)) // self.n_z
             z2 = i % self.n_z
 
-            dist = self.grid.get_distance(idx, i, mic=True)
-
-            if ball:
-                if 0 <= dist <= cutoff + tolerance:
-                    neighbors.append((x2, y2, z2))
-                    if debug:
-                        print(f"Neighbor: ({x2}, {y2}, {z2}), Distance: {dist:.4f} Å")
-
-            else:
-                if  ( cutoff - tolerance)<= dist <= cutoff + tolerance:
-                    neighbors.append((x2, y2, z2))
-                    if debug:
-                        print(f"Neighbor: ({x2}, {y2}, {z2}), Distance: {dist:.4f} Å")
+            neighbors.append((x2, y2, z2))
+            if debug:
+                print(f"Neighbor: ({x2}, {y2}, {z2}), Distance: {distances[i]:.4f} Å")
 
         return neighbors
 
@@ -95,13 +207,14 @@ class NeighborAndDistancesMixin:
         :param system: Coordinate system to use ("int", "frac", or "cart")
         :param pos_rounding: How to round fractional/cartesian positions ("floor", "ceil", or "round")
         :param ball: If True, returns all neighbors within cutoff + tolerance
-        :return: list of encoded neighbor variables for SAT solver
+        :return: list of encoded neighbor variables for SAT solver, leaving out positions whose domain excludes atom_id
         """
         encoded_neighbors = []
         neighbors = self.get_neighbors(x, y, z, cutoff, tolerance, system=system, pos_rounding=pos_rounding, debug=False, ball=ball)
 
         for nx, ny, nz in neighbors:
-            encoded_neighbors.append(int(self.encode_var(nx, ny, nz, atom_id)))
+            if atom_id in self.site_types(nx, ny, nz):
+                encoded_neighbors.append(int(self.encode_var(nx, ny, nz, atom_id)))
 
         return encoded_neighbors
 
@@ -1,6 +1,4 @@
 
-from itertools import combinations
-
 class NeighborConstraintsMixin:
 
 
@@ -15,14 +13,36 @@ class NeighborConstraintsMixin:
         :param ball:
         :return:
         """
-        for x in range(self.n_x):
-            for y in range(self.n_y):
-                for z in range(self.n_z):
-                    atom = self.encode_var(x, y, z, target_id)
-                    for neighbor_id in forbidden_neighbor_ids:
-                        neighbors = self.encode_neighbors(x, y, z, atom_id= neighbor_id, cutoff = cutoff, tolerance = tolerance, system="int", pos_rounding="int", ball=ball)
-                        for neighbor in neighbors:
-                            self.cnf.append([-atom, -neighbor])
+        self.activate_types([target_id] + list(forbidden_neighbor_ids))
+        self.add_distance_constraint(("isolate", target_id, tuple(forbidden_neighbor_ids), cutoff, tolerance, ball))
+
+
+    def isolation_clauses(self, target_id, forbidden_neighbor_ids, cutoff, tolerance, ball=True):
+        """
+        Generates the clauses of isolate_from_types() for the current cell.
+        forbidden_neighbor_ids None stands for all other active types.
+        :return: int numpy array of shape (m, 2), one binary clause per row
+        """
+        import numpy as np
+
+        if forbidden_neighbor_ids is None:
+            forbidden_neighbor_ids = [k for k in self.all_types if k != target_id]
+        if not forbidden_neighbor_ids:
+            return []
+
+        # every (target position, neighbor position) pair, filtered by the domains and turned into one block of clauses per neighbor type
+        sources, targets = self.neighbor_pairs(cutoff, tolerance, ball=ball)
+        mask = self.type_mask([target_id] + list(forbidden_neighbor_ids))
+        keep = mask[sources, 0]
+        sources, targets = sources[keep], targets[keep]
+
+        blocks = []
+        for j, neighbor_id in enumerate(forbidden_neighbor_ids, start=1):
+            keep = mask[targets, j]
+            blocks.append(np.stack([-(sources[keep] * self.k + target_id + 1),
+                                    -(targets[keep] * self.k + neighbor_id + 1)], axis=1))
+
+        return np.concatenate(blocks)
 
 
     def isolate(self, target_id, cutoff, tolerance, ball=True):
@@ -35,6 +55,12 @@ class NeighborConstraintsMixin:
         :return:
         """
 
+        if self.lazy:
+            # "all other types" follows the types activated later on
+            self.activate_types([target_id])
+            self.add_distance_constraint(("isolate", target_id, None, cutoff, tolerance, True))
+            return
+
         forbidden_neighbor_ids =[k for k in range(self.lower,self.k) if k != target_id]
         self.isolate_from_types(target_id = target_id, forbidden_neighbor_ids = forbidden_neighbor_ids,cutoff= cutoff , tolerance=tolerance, ball=True)
 
@@ -62,27 +88,142 @@ class NeighborConstraintsMixin:
         :param min_dist:
         :return:
         """
-        for (x1, y1, z1), (x2, y2, z2) in combinations(self.positions, 2):
+        self.activate_types([atom_id1, atom_id2])
+        self.add_distance_constraint(("closest_dist", atom_id1, atom_id2, min_dist))
+
+
+    def closest_dist_clauses(self, atom_id1, atom_id2, min_dist):
+        """
+        Generates the clauses of enforce_closest_dist() for the current cell.
+        :return: int numpy array of shape (m, 2), one binary clause per row
+        """
+        import numpy as np
 
-            idx1 = x1 * (self.n_y * self.n_z) + y1 * self.n_z + z1
-            idx2 = x2 * (self.n_y * self.n_z) + y2 * self.n_z + z2
+        rad_1 = self.get_radius(*self.inverse_id(atom_id1)) if isinstance(self.inverse_id(atom_id1),
+                                                                          tuple) else self.get_radius(
+            self.inverse_id(atom_id1))
 
-            rad_1 = self.get_radius(*self.inverse_id(atom_id1)) if isinstance(self.inverse_id(atom_id1),
-                                                                              tuple) else self.get_radius(
-                self.inverse_id(atom_id1))
+        rad_2 = self.get_radius(*self.inverse_id(atom_id2)) if isinstance(self.inverse_id(atom_id2),
+                                                                          tuple) else self.get_radius(
+            self.inverse_id(atom_id2))
 
-            rad_2 = self.get_radius(*self.inverse_id(atom_id2)) if isinstance(self.inverse_id(atom_id2),
-                                                                              tuple) else self.get_radius(
-                self.inverse_id(atom_id2))
+        # unordered pairs of positions closer than the minimum separation
+        sources, targets = self.neighbor_pairs(rad_1 + rad_2 + min_dist, 0.0)
+        pairs = sources < targets
+        sources, targets = sources[pairs], targets[pairs]
+        close = self.pair_distances(sources, targets) < rad_1 + rad_2 + min_dist
+        sources, targets = sources[close], targets[close]
 
-            dist = self.grid.get_distance(idx1, idx2, mic=True)
+        mask = self.type_mask([atom_id1, atom_id2])
+        blocks = []
+        for (i, id_i), (j, id_j) in (((0, atom_id1), (1, atom_id2)), ((1, atom_id2), (0, atom_id1))):
+            keep = mask[sources, i] & mask[targets, j]
+            blocks.append(np.stack([-(sources[keep] * self.k + id_i + 1),
+                                    -(targets[keep] * self.k + id_j + 1)], axis=1))
 
-            if dist < rad_1 + rad_2 + min_dist:
-                self.cnf.append([-self.encode_var(x1, y1, z1, atom_id1),
-                                 -self.encode_var(x2, y2, z2, atom_id2)])
+        return np.concatenate(blocks)
 
-                self.cnf.append([-self.encode_var(x1, y1, z1, atom_id2),
-                                 -self.encode_var(x2, y2, z2, atom_id1)])
 
+    def coordinate(self, center_id, neighbor_ids, cutoff, tolerance, min_count=None, max_count=None, ball=True):
+        """
+        Bounds the coordination number of an atom type: every atom of type center_id must have between
+        min_count and max_count atoms of the neighbor types within the given distance.
+        E.g. coordinate(Ti, [O], 2.0, 0.1, 6, 6) makes every Ti have exactly 6 O within 2.1 Å.
+        Each position gets a conditional cardinality constraint (center atom -> count in [min_count, max_count])
+        on a totalizer that overlapping neighborhoods share.
+        :param center_id: atom type ID whose neighborhoods are counted
+        :param neighbor_ids: array [] of atom type IDs that count as neighbors
+        :param cutoff: cutoff distance (Å) for neighbors
+        :param tolerance: tolerance for distance matching (Å)
+        :param min_count: minimum number of neighbors, None for no lower bound
+        :param max_count: maximum number of neighbors, None for no upper bound
+        :param ball: if True, counts all neighbors within cutoff + tolerance; if False, only those within [cutoff - tolerance, cutoff + tolerance]
+        :return:
+        """
+        if min_count is None and max_count is None:
+            raise ValueError("coordinate() needs min_count, max_count or both.")
+        if min_count is not None and max_count is not None and min_count > max_count:
+            raise ValueError(f"min_count {min_count} is greater than max_count {max_count}.")
 
+        self.activate_types([center_id] + list(neighbor_ids))
+        self.add_distance_constraint(("coordination", center_id, tuple(neighbor_ids), cutoff, tolerance,
+                                      min_count, max_count, ball))
 
+
+    def coordination_clauses(self, center_id, neighbor_ids, cutoff, tolerance, min_count=None, max_count=None, ball=True):
+        """
+        Generates the clauses of coordinate() for the current cell.
+        A neighbor is counted once per periodic image within the distance, so cells smaller than twice the cutoff
+        count the images of a position separately, as in the crystal.
+        :return: list of clauses
+        """
+        import numpy as np
+
+        clauses = []
+        built = {}
+        cap = min_count if max_count is None else max_count + 1
+        low = 0.0 if ball else cutoff - tolerance
+        high = cutoff + tolerance
+
+        n_sites = self.n_x * self.n_y * self.n_z
+        targets = np.arange(n_sites)
+        available = np.zeros(n_sites, dtype=bool)
+        available[[(x * self.n_y + y) * self.n_z + z for x, y, z in self.positions]] = True
+
+        # (center literal, neighbor positions, image counts) of every position that may hold the center type
+        shells = []
+        for x, y, z in self.positions:
+            if center_id not in self.site_types(x, y, z):
+                continue
+            counts = self.pair_image_counts((x * self.n_y + y) * self.n_z + z, targets, low, high)
+            shell = np.flatnonzero((counts > 0) & available)
+            shells.append((self.encode_var(x, y, z, center_id), shell.tolist(), counts[shell].tolist()))
+
+        # every image is one input of the totalizer, keyed by position so that nearby neighborhoods share nodes
+        stride = max((max(images, default=1) for _, _, images in shells), default=1)
+
+        for center, shell, images in shells:
+            items = []
+            for index, count in zip(shell, images):
+                lit = self._any_type_literal(*self.valid_positions[index], neighbor_ids, clauses, built)
+                if lit is not None:
+                    items.extend((index * stride + image, lit) for image in range(count))
+
+            if min_count is not None and min_count > len(items):
+                clauses.append([-center])
+                continue
+
+            counts = self.shared_totalizer(items, cap, clauses, built)
+
+            # counts[j] is true when at least j + 1 neighbors are present
+            if min_count is not None and min_count > 0:
+                clauses.append([-center, counts[min_count - 1]])
+            if max_count is not None and max_count < len(counts):
+                clauses.append([-center, -counts[max_count]])
+
+        return clauses
+
+
+    def _any_type_literal(self, x, y, z, atom_ids, clauses, built):
+        """
+        Gets a literal that is true if and only if the position holds one of the given atom types.
+        Positions hold at most one type, so the literal counts as one neighbor.
+        Returns None if the domain of the position excludes all of the types.
+        """
+        domain = self.site_types(x, y, z)
+        atom_ids = [atom_id for atom_id in atom_ids if atom_id in domain]
+        if not atom_ids:
+            return None
+        if len(atom_ids) == 1:
+            return self.encode_var(x, y, z, atom_ids[0])
+
+        key = ("any", x, y, z, tuple(atom_ids))
+        if key not in built:
+            types = [self.encode_var(x, y, z, atom_id) for atom_id in atom_ids]
+            lit = self.vpool.id(key)
+            clauses.append([-lit] + types)
+            for var in types:
+                clauses.append([lit, -var])
+            built[key] = lit
+
+        return built[key]
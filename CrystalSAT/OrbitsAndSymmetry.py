@@ -1,6 +1,4 @@
-from pymatgen.symmetry.groups import SpaceGroup
 import numpy as np
-from pysat.card import CardEnc
 
 class OrbitsAndSymmetryMixin:
 
@@ -31,6 +29,8 @@ class OrbitsAndSymmetryMixin:
         :param space_group: space group number or symbol
         :return: list of symmetry positions
         """
+        from pymatgen.symmetry.groups import SpaceGroup
+
         sg = SpaceGroup(space_group)
 
         # Create the input position as fractional coordinates
@@ -86,6 +86,8 @@ class OrbitsAndSymmetryMixin:
         If eligible_orbits is provided, restrict the choice to that subset.
         """
 
+        from pysat.card import CardEnc
+
         forced_orbits_count = len(self.grab_forced_orbits(atom_id))
         if eligible_orbits is None:
             orbit_vars = [self.orbit_var(oid, atom_id) for oid in self.orbit_dict.keys()]
@@ -96,15 +98,15 @@ class OrbitsAndSymmetryMixin:
                 elif adjusted_min_count > forced_orbits_count + len(self.orbit_dict):
                     raise ValueError(f"min_count {min_count} is greater than the number of available orbits {len(self.orbit_dict)} + forced orbits {forced_orbits_count} for atom type {atom_id}.")
 
-                atleast = CardEnc.atleast(lits=orbit_vars, bound=adjusted_min_count, encoding=1, vpool=self.vpool)
+                if weight is None:
+                    self.add_atleast(orbit_vars, adjusted_min_count)
+                else:
+                    atleast = CardEnc.atleast(lits=orbit_vars, bound=adjusted_min_count, encoding=1, vpool=self.vpool)
 
-                for cl in atleast.clauses:
-                    if weight is None:
-                        self.cnf.append(cl)
-                    else:
+                    for cl in atleast.clauses:
                         self.cnf.append(cl, weight=weight)
 
-                self.vpool.start_from = self.vpool.id
+                    self.vpool.start_from = self.vpool.id
 
             if max_count is not None:
                 adjusted_max_count = max_count - forced_orbits_count
@@ -112,14 +114,14 @@ class OrbitsAndSymmetryMixin:
                     raise ValueError(f"max_count {max_count} is less than the number of forced orbits {forced_orbits_count} for atom type {atom_id}.")
                 elif adjusted_max_count > len(self.orbit_dict):
                     raise ValueError(f"max_count {max_count} is greater than the number of available orbits {len(self.orbit_dict)} + forced orbits {forced_orbits_count} for atom type {atom_id}.")
-                atmost = CardEnc.atmost(lits=orbit_vars, bound=adjusted_max_count, encoding=1, vpool=self.vpool)
-                for cl in atmost.clauses:
-                    if weight is None:
-                        self.cnf.append(cl)
-                    else:
+                if weight is None:
+                    self.add_atmost(orbit_vars, adjusted_max_count)
+                else:
+                    atmost = CardEnc.atmost(lits=orbit_vars, bound=adjusted_max_count, encoding=1, vpool=self.vpool)
+                    for cl in atmost.clauses:
                         self.cnf.append(cl, weight=weight)
 
-                self.vpool.start_from = self.vpool.id
+                    self.vpool.start_from = self.vpool.id
 
 
 
@@ -168,14 +170,7 @@ class OrbitsAndSymmetryMixin:
 
         forced = []
 
-        if hasattr(self.cnf, "hard") and hasattr(self.cnf, "soft"):
-            # WCNF format
-            all_clauses = self.cnf.hard
-        else:
-            # CNF format
-            all_clauses = self.cnf.clauses
-
-        for clause in all_clauses:
+        for clause in self.grab_hard_clauses():
             if len(clause) == 1 and clause[0] > 0:
                 var  = clause[0]
                 obj = self.orbit_pool.obj(var)
@@ -0,0 +1,262 @@
+
+class PresolveMixin:
+
+    def presolve(self, eliminate_pure=False):
+        """
+        Simplifies the hard clauses before they are loaded into the solver.
+        Runs unit propagation, drops satisfied, tautological and duplicate clauses and false literals,
+        fixes pure variables and renumbers the remaining variables from 1.
+        Native at-most constraints are renumbered along, without their fixed literals; their variables are never fixed as pure.
+        solve(), solve_multiple() and iter_solutions() then load the simplified CNF and map every model
+        back to the original variables, so decode_solution() and export_to_ase() work unchanged.
+        Auxiliary variables are always eliminated when pure. Pure site variables are only fixed if eliminate_pure
+        is True; that keeps satisfiability, but enumeration then skips structures that differ only in optional atoms,
+        so only use it to find a single solution.
+        Site variables left free because all their clauses are satisfied keep a variable, so enumeration still covers them.
+        The simplification is redone automatically when clauses are added or the cell changes.
+        :param eliminate_pure: if True, also fixes pure site variables
+        :return: dict with statistics of the simplification
+        """
+        clauses = self.grab_hard_clauses()
+        stats = {"clauses_before": len(clauses), "vars_before": len({abs(lit) for clause in clauses for lit in clause}),
+                 "duplicates": 0, "tautologies": 0, "fixed": 0, "pure": 0}
+
+        # normalise: drop repeated literals, tautologies and duplicate clauses
+        alive = []
+        seen = set()
+        for clause in clauses:
+            lits = frozenset(clause)
+            if any(-lit in lits for lit in lits):
+                stats["tautologies"] += 1
+            elif lits in seen:
+                stats["duplicates"] += 1
+            else:
+                seen.add(lits)
+                alive.append(lits)
+
+        occurrences = {}
+        for ci, lits in enumerate(alive):
+            for lit in lits:
+                occurrences.setdefault(lit, []).append(ci)
+
+        value = {}
+        satisfied = [False] * len(alive)
+        unsat = False
+
+        # unit propagation
+        queue = [next(iter(lits)) for lits in alive if len(lits) == 1]
+        if any(len(lits) == 0 for lits in alive):
+            unsat = True
+
+        while queue and not unsat:
+            lit = queue.pop()
+            if abs(lit) in value:
+                if value[abs(lit)] != (lit > 0):
+                    unsat = True
+                continue
+            value[abs(lit)] = lit > 0
+
+            for ci in occurrences.get(lit, ()):
+                satisfied[ci] = True
+
+            for ci in occurrences.get(-lit, ()):
+                if satisfied[ci]:
+                    continue
+                free = []
+                for other in alive[ci]:
+                    other_value = value.get(abs(other))
+                    if other_value is None:
+                        free.append(other)
+                    elif other_value == (other > 0):
+                        satisfied[ci] = True
+                        break
+                else:
+                    if not free:
+                        unsat = True
+                        break
+                    if len(free) == 1:
+                        queue.append(free[0])
+
+        stats["fixed"] = len(value)
+
+        # variables of native at-most constraints (see use_native_cardinality()) are never pure and always kept
+        frozen = {abs(lit) for lits, _ in self.atmosts for lit in lits}
+
+        # pure literal elimination, repeated since removing clauses can make more variables pure
+        while not unsat:
+            polarity = {}
+            for ci, lits in enumerate(alive):
+                if satisfied[ci]:
+                    continue
+                for lit in lits:
+                    if abs(lit) not in value:
+                        polarity[abs(lit)] = polarity.get(abs(lit), 0) | (1 if lit > 0 else 2)
+
+            pure = [var if sign == 1 else -var for var, sign in polarity.items()
+                    if sign != 3 and var not in frozen and (eliminate_pure or var > self.max_real)]
+            if not pure:
+                break
+
+            for lit in pure:
+                value[abs(lit)] = lit > 0
+                for ci in occurrences.get(lit, ()):
+                    satisfied[ci] = True
+            stats["pure"] += len(pure)
+
+        # reduce the remaining clauses and renumber their variables
+        reduced = []
+        old_vars = []
+        new_ids = {}
+        atmosts = []
+        seen = set()
+
+        if unsat:
+            reduced.append([])
+        else:
+            for ci, lits in enumerate(alive):
+                if satisfied[ci]:
+                    continue
+                lits = frozenset(lit for lit in lits if abs(lit) not in value)
+                if lits in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(lits)
+
+                clause = []
+                for lit in sorted(lits, key=abs):
+                    if abs(lit) not in new_ids:
+                        old_vars.append(abs(lit))
+                        new_ids[abs(lit)] = len(old_vars)
+                    clause.append(new_ids[abs(lit)] if lit > 0 else -new_ids[abs(lit)])
+                reduced.append(clause)
+
+            for var in sorted(frozen):
+                if var not in value and var not in new_ids:
+                    old_vars.append(var)
+                    new_ids[var] = len(old_vars)
+
+            # site variables whose clauses were all satisfied by fixed literals are free, not empty
+            for var in sorted({abs(lit) for lit in occurrences}):
+                if var not in value and var not in new_ids and self.is_site_var(var):
+                    old_vars.append(var)
+                    new_ids[var] = len(old_vars)
+
+            # solvers only create the variables their clauses mention (up to the largest one)
+            if max((abs(lit) for clause in reduced for lit in clause), default=0) < len(old_vars):
+                reduced.append([len(old_vars), -len(old_vars)])
+
+            # at-most constraints: drop fixed literals, every true one uses up one of the bound
+            for lits, bound in self.atmosts:
+                free = []
+                for lit in lits:
+                    if abs(lit) not in value:
+                        free.append(new_ids[abs(lit)] if lit > 0 else -new_ids[abs(lit)])
+                    elif value[abs(lit)] == (lit > 0):
+                        bound -= 1
+                if bound < 0:
+                    unsat = True
+                    reduced = [[]]
+                    atmosts = []
+                    break
+                if bound < len(free):
+                    atmosts.append((free, bound))
+
+        self.presolved = {
+            "clauses": reduced,
+            "atmosts": atmosts,
+            "old_vars": old_vars,
+            "fixed": sorted((var if positive else -var for var, positive in value.items()), key=abs),
+            "eliminate_pure": eliminate_pure,
+            "source": self._presolve_source(),
+        }
+
+        stats.update({"clauses_after": len(reduced), "vars_after": len(old_vars), "unsat": unsat})
+        self.presolve_stats = stats
+        return stats
+
+
+    def clear_presolve(self):
+        """
+        Discards the simplified CNF, so the solvers load the hard clauses as they are.
+        :return:
+        """
+        self.presolved = None
+
+
+    def expand_model(self, model):
+        """
+        Maps a model of the simplified CNF back to the original variables.
+        Returns the model unchanged if presolve() has not been called.
+        :param model: model of the CNF loaded into the solver
+        :return: model in the original numbering, sorted by variable
+        """
+        if self.presolved is None or model is None:
+            return model
+
+        old_vars = self.presolved["old_vars"]
+        expanded = list(self.presolved["fixed"])
+        for lit in model:
+            if abs(lit) <= len(old_vars):
+                var = old_vars[abs(lit) - 1]
+                expanded.append(var if lit > 0 else -var)
+
+        return sorted(expanded, key=abs)
+
+
+    def original_var(self, var):
+        """
+        Gets the original ID of a variable of the CNF loaded into the solver.
+        :param var: positive variable ID
+        :return: variable ID in the model's numbering, None for variables the simplification does not know
+        """
+        if self.presolved is None:
+            return var
+
+        old_vars = self.presolved["old_vars"]
+        return old_vars[var - 1] if var <= len(old_vars) else None
+
+
+    def solver_clauses(self):
+        """
+        Gets the clauses to load into the solver: the simplified CNF after presolve(), else the hard clauses.
+        The simplification is redone if the hard clauses changed since it was computed.
+        :return: list of clauses
+        """
+        if self.presolved is None:
+            return self.grab_hard_clauses()
+
+        if self.presolved["source"] != self._presolve_source():
+            self.presolve(eliminate_pure=self.presolved["eliminate_pure"])
+
+        return self.presolved["clauses"]
+
+
+    def solver_atmosts(self):
+        """
+        Gets the native at-most constraints to load into the solver, renumbered like solver_clauses() after presolve().
+        :return: list of (lits, bound) pairs
+        """
+        if self.presolved is None:
+            return self.atmosts
+
+        self.solver_clauses()
+        return self.presolved["atmosts"]
+
+
+    def solver_top_id(self):
+        """
+        Gets the largest variable ID the clauses and at-most constraints loaded into the solver may use.
+        :return: int
+        """
+        if self.presolved is None:
+            return max(self.cnf.nv, self.vpool.top, self.max_real)
+
+        self.solver_clauses()
+        return len(self.presolved["old_vars"])
+
+
+    def _presolve_source(self):
+        """
+        Identifies the hard clauses and at-most constraints a simplification was computed from.
+        """
+        return id(self.cnf), len(self.grab_hard_clauses()), self.cnf_revision, len(self.atmosts)
@@ -0,0 +1,81 @@
+
+class RefineMixin:
+
+    def solve_coarse_to_fine(self, factor, build, solver_name="glucose3", radius=None, keep_types=True,
+                             max_attempts=1, timeout=None):
+        """
+        Solves the model by first solving a coarser grid and then re-solving this grid only around the coarse atoms.
+        The coarse grid has n_x / factor x n_y / factor x n_z / factor points in the same cell. Each occupied coarse
+        position is mapped to the block of fine positions around it, and the fine model is restricted to those blocks
+        before its constraints are added, so it is far smaller than a direct solve of this grid.
+        Since the coarse grid only sees some of the fine positions, a coarse solution may not exist even when a fine one does.
+        :param factor: refinement factor; n_x, n_y and n_z must be divisible by it
+        :param build: callable build(crystal) adding the constraints (initialise(), bound_atom(), ...) to a model;
+                      it is called on the coarse model and then on this one
+        :param solver_name: Name of the SAT solver to use
+        :param radius: half-width of the block of fine positions around each coarse atom, in fine grid steps (defaults to factor // 2)
+        :param keep_types: if True, a fine position may only hold the types of the coarse atoms whose block covers it
+        :param max_attempts: number of coarse solutions to try before giving up
+        :param timeout: wall-clock limit in seconds for each solve, None for no limit
+        :return: model of this grid if one was found, None otherwise
+        """
+        if self.sites is not None:
+            raise ValueError("Coarse-to-fine solving needs a rectangular grid, not candidate sites.")
+        if factor < 1 or self.n_x % factor or self.n_y % factor or self.n_z % factor:
+            raise ValueError(f"Grid {self.n_x}x{self.n_y}x{self.n_z} is not divisible by the refinement factor {factor}.")
+        if self.cnf.clauses:
+            raise ValueError("solve_coarse_to_fine() adds the constraints itself, call it on a model without constraints.")
+
+        if radius is None:
+            radius = factor // 2
+
+        self.coarse = type(self)(self.n_x // factor, self.n_y // factor, self.n_z // factor,
+                                 self.a, self.b, self.c, self.alpha, self.beta, self.gamma, self.allowed, lazy=self.lazy)
+        build(self.coarse)
+
+        self.status = None
+        for coarse_solution in self.coarse.iter_solutions(solver_name=solver_name, n_solutions=max_attempts, timeout=timeout):
+            self.reset_constraints()
+            self.restrict_positions(*self.refine_positions(coarse_solution, factor, radius, keep_types))
+            build(self)
+
+            solution = self.solve(solver_name=solver_name, timeout=timeout)
+            if solution is not None:
+                return solution
+
+        if self.status is None:
+            self.status = self.coarse.status
+        return None
+
+
+    def refine_positions(self, coarse_solution, factor, radius, keep_types=True):
+        """
+        Maps the atoms of a coarse solution to the blocks of positions of this grid around them.
+        :param coarse_solution: model of the coarse grid
+        :param factor: refinement factor between the coarse grid and this one
+        :param radius: half-width of each block, in fine grid steps
+        :param keep_types: if True, also returns the atom types allowed at each fine position
+        :return: (positions, types), where types is None unless keep_types is True
+        """
+        positions = set()
+        types = {} if keep_types else None
+        offsets = range(-radius, radius + 1)
+
+        for var in coarse_solution:
+            if var <= 0 or not self.coarse.is_site_var(var):
+                continue
+            site, atom_id = divmod(var - 1, self.k)
+            coarse_x, rest = divmod(site, self.coarse.n_y * self.coarse.n_z)
+            coarse_y, coarse_z = divmod(rest, self.coarse.n_z)
+
+            for dx in offsets:
+                for dy in offsets:
+                    for dz in offsets:
+                        position = ((coarse_x * factor + dx) % self.n_x,
+                                    (coarse_y * factor + dy) % self.n_y,
+                                    (coarse_z * factor + dz) % self.n_z)
+                        positions.add(position)
+                        if keep_types:
+                            types.setdefault(position, set()).add(atom_id)
+
+        return positions, types
@@ -0,0 +1,152 @@
+import time
+
+from .SolveAndExport import SAT, UNSAT, UNKNOWN
+
+
+class SamplingMixin:
+
+    def iter_samples(self, solver_name="glucose3", n_samples=None, method="phases", min_distance=None, seed=None,
+                     xor_size=4, timeout=None, conflict_budget=None, prop_budget=None):
+        """
+        Draws diverse solutions one at a time, instead of the solver order of iter_solutions(), where consecutive
+        solutions usually differ in one or two sites.
+        Before every call the solver's phases are set to a random occupancy, so each search heads for a different
+        part of the solution space. With method "xor", the solutions are also restricted to a random cell of the
+        solution space, cut out by random parity (XOR) constraints over the site variables; the number of constraints
+        adapts so the cells hold few solutions, which brings the samples closer to uniform at the cost of harder solver calls.
+        Short constraints (xor_size) keep the calls tractable; long ones hash better but CDCL solvers handle them poorly.
+        With min_distance, every sample differs from all previous ones in at least min_distance of their atoms
+        (moved, removed or changed species). Samples are blocked, so none is drawn twice.
+        self.status is set as in iter_solutions(); UNSAT means no further sample exists.
+        :param solver_name: Name of the SAT solver to use
+        :param n_samples: Number of samples to draw, None to draw until no further sample exists
+        :param method: "phases" (random phases only) or "xor" (random phases and random XOR cells)
+        :param min_distance: minimum number of atoms by which a sample differs from each previous one, None for no minimum
+        :param seed: seed of the random generator, None for a random seed
+        :param xor_size: number of site variables in each XOR constraint of method "xor"
+        :param timeout: wall-clock limit in seconds for the whole sampling, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :return: generator of models
+        """
+        import numpy as np
+
+        if method not in ("phases", "xor"):
+            raise ValueError(f"Unknown sampling method {method}, use 'phases' or 'xor'.")
+
+        rng = np.random.default_rng(seed)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.status = UNKNOWN  # until the sampling ends
+        found = 0
+        n_xor = 0
+
+        with self._make_solver(solver_name) as solver:
+            site_vars, chance = self._sampling_sites()
+            top = max(self.solver_top_id(), solver.nof_vars())
+
+            while n_samples is None or found < n_samples:
+                positive = rng.random(len(site_vars)) < chance
+                solver.set_phases(np.where(positive, site_vars, -site_vars).tolist())
+
+                assumptions = []
+                if method == "xor" and n_xor > 0:
+                    top += 1
+                    selector = top
+                    clauses, top = self._xor_cell_clauses(rng, site_vars, n_xor, xor_size, selector, top)
+                    solver.append_formula(clauses)
+                    assumptions = [selector]
+
+                is_sat = self._solve_limited(solver, assumptions=assumptions, deadline=deadline,
+                                             conflict_budget=conflict_budget, prop_budget=prop_budget)
+                model = solver.get_model() if is_sat else None
+                if assumptions:
+                    # the cell is only used for this call
+                    solver.add_clause([-assumptions[0]])
+
+                if is_sat is None:
+                    self.status = UNKNOWN
+                    return
+                if not is_sat:
+                    if not assumptions:
+                        self.status = UNSAT
+                        return
+                    # empty cell: try a larger one
+                    n_xor -= 1
+                    continue
+
+                n_xor += 1
+                found += 1
+                solution = self.expand_model(model)
+
+                occupied = [lit for lit in model if lit > 0 and self.is_site_var(self.original_var(lit))]
+                solver.add_clause([-lit for lit in model if self.is_site_var(self.original_var(abs(lit)))])
+                if min_distance is not None and len(occupied) >= min_distance:
+                    top = self._load_atmosts(solver, [(occupied, len(occupied) - min_distance)], top)
+
+                yield solution
+
+            self.status = SAT
+
+
+    def sample_solutions(self, solver_name="glucose3", n_samples=1, method="phases", min_distance=None, seed=None,
+                         xor_size=4, timeout=None, conflict_budget=None, prop_budget=None):
+        """
+        Draws diverse solutions, see iter_samples().
+        If the timeout or a budget runs out, the samples drawn so far are returned and self.status is UNKNOWN.
+        :param solver_name: Name of the SAT solver to use
+        :param n_samples: Number of samples to draw
+        :param method: "phases" or "xor", see iter_samples()
+        :param min_distance: minimum number of atoms by which a sample differs from each previous one, None for no minimum
+        :param seed: seed of the random generator, None for a random seed
+        :param xor_size: number of site variables in each XOR constraint of method "xor"
+        :param timeout: wall-clock limit in seconds for the whole sampling, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :return: List of solutions, where each solution is a list of integers representing the model
+        """
+        return list(self.iter_samples(solver_name=solver_name, n_samples=n_samples, method=method,
+                                      min_distance=min_distance, seed=seed, xor_size=xor_size, timeout=timeout,
+                                      conflict_budget=conflict_budget, prop_budget=prop_budget))
+
+
+    def _sampling_sites(self):
+        """
+        Gets the site variables of the solver and the chance to give each a positive phase,
+        1 / (number of types at its position + 1), so a random phase assignment is close to one atom or none per position.
+        :return: (int numpy array of solver variables, float numpy array of chances)
+        """
+        import numpy as np
+
+        solver_vars = []
+        positions = []
+        for var in range(1, self.solver_top_id() + 1):
+            original = self.original_var(var)
+            if original is not None and self.is_site_var(original):
+                solver_vars.append(var)
+                positions.append((original - 1) // self.k)
+
+        positions = np.array(positions, dtype=np.int64)
+        _, inverse, counts = np.unique(positions, return_inverse=True, return_counts=True)
+        return np.array(solver_vars, dtype=np.int64), 1.0 / (counts[inverse] + 1)
+
+
+    @staticmethod
+    def _xor_cell_clauses(rng, site_vars, n_xor, xor_size, selector, top):
+        """
+        Encodes n_xor random parity constraints over xor_size random site variables each,
+        active only while the selector literal is assumed. Each constraint is chained through auxiliary variables
+        t_i = t_(i-1) xor x_i.
+        :return: (clauses, new top_id)
+        """
+        clauses = []
+        for _ in range(n_xor):
+            lits = rng.choice(site_vars, size=min(xor_size, len(site_vars)), replace=False).tolist()
+
+            chain = lits[0]
+            for lit in lits[1:]:
+                top += 1
+                clauses += [[-top, chain, lit], [-top, -chain, -lit], [top, -chain, lit], [top, chain, -lit]]
+                chain = top
+            clauses.append([-selector, chain if rng.random() < 0.5 else -chain])
+
+        return clauses, top
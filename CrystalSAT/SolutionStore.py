@@ -0,0 +1,265 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from math import gcd
+
+
+def parse_composition(composition):
+    """
+    Normalises a composition to the form the store indexes, with elements in alphabetical order.
+    :param composition: formula string such as "Pb1Ti1O3" or "PbTiO3", or a dict of element counts
+    :return: formula string with explicit counts, e.g. "O3Pb1Ti1"
+    """
+    if isinstance(composition, str):
+        counts = Counter()
+        for symbol, count in re.findall(r"([A-Z][a-z]?)(\d*)", composition):
+            counts[symbol] += int(count) if count else 1
+    else:
+        counts = Counter(composition)
+
+    return "".join(f"{symbol}{counts[symbol]}" for symbol in sorted(counts) if counts[symbol] > 0)
+
+
+def reduce_composition(composition):
+    """
+    Divides the counts of a composition by their greatest common divisor.
+    :param composition: formula string or dict of element counts
+    :return: reduced formula string, e.g. "O6Pb2Ti2" -> "O3Pb1Ti1"
+    """
+    formula = parse_composition(composition)
+    counts = [(symbol, int(count)) for symbol, count in re.findall(r"([A-Z][a-z]?)(\d+)", formula)]
+    divisor = 0
+    for _, count in counts:
+        divisor = gcd(divisor, count)
+    return "".join(f"{symbol}{count // divisor}" for symbol, count in counts)
+
+
+class SolutionStore:
+    """
+    Stores solutions of one model compactly in an SQLite database: only the atom type at each site is kept,
+    as a packed array of species IDs (0 for an empty site), indexed by composition and by fingerprint.
+    The cell, the site positions and the species are stored with them, so structures can be rebuilt as
+    ASE Atoms without the model.
+    """
+
+    def __init__(self, filename, crystal=None, mmap_size=2 ** 30):
+        """
+        Opens a store, creating it if needed.
+        :param filename: path of the database file
+        :param crystal: CrystalSAT model whose solutions are added; needed to create a store and to add solutions
+        :param mmap_size: number of bytes of the database file SQLite reads through a memory map
+        """
+        import sqlite3
+
+        self.crystal = crystal
+        self.db = sqlite3.connect(filename)
+        self.db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS structures (
+                id INTEGER PRIMARY KEY,
+                composition TEXT NOT NULL,
+                reduced TEXT NOT NULL,
+                fingerprint TEXT NOT NULL UNIQUE,
+                occupancy BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS structures_composition ON structures (composition);
+            CREATE INDEX IF NOT EXISTS structures_reduced ON structures (reduced);
+        """)
+
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if not meta:
+            if crystal is None:
+                raise ValueError(f"{filename} is not a solution store yet, a model is needed to create it.")
+            meta = self._model_meta(crystal)
+            with self.db:
+                self.db.executemany("INSERT INTO meta VALUES (?, ?)", meta.items())
+        elif crystal is not None:
+            expected = self._model_meta(crystal)
+            if any(meta[key] != expected[key] for key in ("n_sites", "k", "species", "frac")):
+                raise ValueError(f"{filename} stores solutions of a different model.")
+
+        self.n_sites = int(meta["n_sites"])
+        self.dtype = meta["dtype"]
+        self.cellpar = json.loads(meta["cellpar"])
+        self.frac = json.loads(meta["frac"])
+        self.species = json.loads(meta["species"])
+
+
+    @staticmethod
+    def _model_meta(crystal):
+        """
+        Describes the geometry and species of a model, as stored in the meta table.
+        """
+        species = [None] * crystal.k
+        for atom_id in range(crystal.lower, crystal.k):
+            label = crystal.inverse_id(atom_id)
+            species[atom_id] = list(label) if isinstance(label, tuple) else label
+
+        return {
+            "n_sites": str(len(crystal.valid_positions)),
+            "k": str(crystal.k),
+            "dtype": "uint8" if crystal.k < 255 else "uint16",
+            "cellpar": json.dumps([crystal.a, crystal.b, crystal.c, crystal.alpha, crystal.beta, crystal.gamma]),
+            "frac": json.dumps(crystal.to_frac_array(crystal.valid_positions).round(12).tolist()),
+            "species": json.dumps(species),
+        }
+
+
+    def _symbol(self, atom_id):
+        label = self.species[atom_id]
+        return label[0] if isinstance(label, list) else label
+
+
+    def _row(self, occupancy):
+        """
+        Packs the occupancy of a solution into (composition, reduced composition, fingerprint, blob).
+        """
+        import numpy as np
+
+        packed = (np.asarray(occupancy) + 1).astype(self.dtype).tobytes()
+        ids, counts = np.unique(occupancy[occupancy >= 0], return_counts=True)
+        elements = Counter()
+        for atom_id, count in zip(ids.tolist(), counts.tolist()):
+            elements[self._symbol(atom_id)] += count
+
+        fingerprint = hashlib.blake2b(packed, digest_size=16).hexdigest()
+        return parse_composition(elements), reduce_composition(elements), fingerprint, packed
+
+
+    def add(self, solution):
+        """
+        Adds a solution of the model; a structure that is already stored is skipped.
+        :param solution: model (list of literals)
+        :return: True if the structure was new
+        """
+        return self.add_many([solution]) == 1
+
+
+    def add_many(self, solutions):
+        """
+        Adds solutions in one transaction. Solutions are consumed one at a time, so an iterator such as
+        crystal.iter_solutions() can be stored without keeping the full models in memory.
+        :param solutions: iterable of models (lists of literals)
+        :return: number of new structures
+        """
+        if self.crystal is None:
+            raise ValueError("The store was opened without a model, solutions cannot be added.")
+
+        before = self.db.total_changes
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO structures (composition, reduced, fingerprint, occupancy) "
+                                "VALUES (?, ?, ?, ?)",
+                                (self._row(self.crystal.occupancy(solution)) for solution in solutions))
+        return self.db.total_changes - before
+
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
+
+
+    def compositions(self, reduced=False):
+        """
+        Counts the stored structures per composition.
+        :param reduced: group by reduced composition (e.g. O6Pb2Ti2 is counted as O3Pb1Ti1)
+        :return: dict mapping composition to number of structures
+        """
+        column = "reduced" if reduced else "composition"
+        return dict(self.db.execute(f"SELECT {column}, COUNT(*) FROM structures GROUP BY {column}"))
+
+
+    def _where(self, composition, reduced):
+        if composition is None:
+            return "", ()
+        if reduced:
+            return " WHERE reduced = ?", (reduce_composition(composition),)
+        return " WHERE composition = ?", (parse_composition(composition),)
+
+
+    def ids(self, composition=None, reduced=False):
+        """
+        IDs of the stored structures, optionally only those of one composition.
+        :param composition: formula string such as "Pb1Ti1O3", or dict of element counts
+        :param reduced: match the reduced composition, so "PbTiO3" also finds Pb2Ti2O6
+        :return: list of structure IDs
+        """
+        where, args = self._where(composition, reduced)
+        return [row[0] for row in self.db.execute(f"SELECT id FROM structures{where} ORDER BY id", args)]
+
+
+    def occupancies(self, composition=None, reduced=False):
+        """
+        Atom type at every site of the stored structures, optionally only those of one composition.
+        :param composition: formula string or dict of element counts
+        :param reduced: match the reduced composition
+        :return: (ids, int numpy array of shape (n_structures, n_sites)) with -1 where a site is empty
+        """
+        import numpy as np
+
+        where, args = self._where(composition, reduced)
+        rows = self.db.execute(f"SELECT id, occupancy FROM structures{where} ORDER BY id", args).fetchall()
+        ids = [row[0] for row in rows]
+        packed = np.frombuffer(b"".join(row[1] for row in rows), dtype=self.dtype).reshape(len(rows), self.n_sites)
+        return ids, packed.astype(np.int64) - 1
+
+
+    def occupancy(self, structure_id):
+        """
+        Atom type at every site of one stored structure.
+        :param structure_id: ID of the structure
+        :return: int numpy array of shape (n_sites,), -1 where the site is empty
+        """
+        import numpy as np
+
+        row = self.db.execute("SELECT occupancy FROM structures WHERE id = ?", (structure_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No structure with ID {structure_id}")
+        return np.frombuffer(row[0], dtype=self.dtype).astype(np.int64) - 1
+
+
+    def to_atoms(self, occupancy):
+        """
+        Rebuilds a stored structure as an ASE Atoms object, with the charges of ions as initial charges.
+        :param occupancy: structure ID, or occupancy array as returned by occupancy()
+        :return: ASE Atoms object
+        """
+        import numpy as np
+        from ase import Atoms
+        from ase.cell import Cell
+
+        if not hasattr(occupancy, "__len__"):
+            occupancy = self.occupancy(occupancy)
+
+        occupied = np.flatnonzero(np.asarray(occupancy) >= 0)
+        labels = [self.species[atom_id] for atom_id in np.asarray(occupancy)[occupied].tolist()]
+        symbols = [label[0] if isinstance(label, list) else label for label in labels]
+        charges = [label[1] if isinstance(label, list) else 0 for label in labels]
+
+        cell = Cell.fromcellpar(self.cellpar)
+        positions = np.array(self.frac, dtype=float).reshape(-1, 3)[occupied] @ cell.array
+        return Atoms(symbols=symbols, positions=positions, cell=cell, pbc=True, charges=charges)
+
+
+    def query(self, composition=None, reduced=False):
+        """
+        Rebuilds the stored structures of one composition as ASE Atoms objects, one at a time.
+        :param composition: formula string such as "Pb1Ti1O3", or dict of element counts; None for all structures
+        :param reduced: match the reduced composition
+        :return: generator of (structure ID, ASE Atoms object)
+        """
+        import numpy as np
+
+        where, args = self._where(composition, reduced)
+        for structure_id, packed in self.db.execute(f"SELECT id, occupancy FROM structures{where} ORDER BY id", args):
+            yield structure_id, self.to_atoms(np.frombuffer(packed, dtype=self.dtype).astype(np.int64) - 1)
+
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
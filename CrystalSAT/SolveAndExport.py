@@ -1,48 +1,276 @@
-from ase.io import write
-from ase import Atoms
+import threading
+import time
+
+
+# Result of the last solve call, kept in self.status
+SAT = "SAT"
+UNSAT = "UNSAT"
+UNKNOWN = "UNKNOWN"  # a timeout or budget ran out before the solver could decide
+
+def print_progress(metrics):
+    """
+    Prints one line of enumeration metrics; pass it as the progress callback of iter_solutions() or solve_multiple(),
+    together with progress_interval for periodic logging.
+    :param metrics: metrics dict reported by the enumeration
+    :return:
+    """
+    line = (f"{metrics['solutions']} solutions in {metrics['elapsed']:.1f} s, {metrics['solutions_per_second']:.1f}/s "
+            f"(recent {metrics['recent_solutions_per_second']:.1f}/s), {metrics['blocking_clauses']} blocking clauses")
+    if metrics["conflicts"] is not None:
+        line += f", {metrics['conflicts']} conflicts, {metrics['restarts']} restarts"
+    if metrics["done"]:
+        line += f", done ({metrics['status']})"
+    print(line)
+
 
 class SolveAndExportMixin:
 
 
-    def solve(self, solver_name="glucose3"):
+    def solve(self, solver_name="glucose3", timeout=None, conflict_budget=None, prop_budget=None):
         """
         Solves the SAT problem using the specified solver and returns a model if satisfiable.
+        The outcome is stored in self.status as SAT, UNSAT or UNKNOWN (timeout or budget exhausted).
         :param solver_name:
-        :return: model if satisfiable, None if unsatisfiable
+        :param timeout: wall-clock limit in seconds, None for no limit
+        :param conflict_budget: maximum number of conflicts, None for no limit
+        :param prop_budget: maximum number of propagations, None for no limit
+        :return: model if satisfiable, None if unsatisfiable or unknown
         """
-        from pysat.solvers import Solver
-        with Solver(name=solver_name, bootstrap_with=self.cnf.clauses) as solver:
-            is_sat = solver.solve()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._make_solver(solver_name) as solver:
+            is_sat = self._solve_limited(solver, deadline=deadline, conflict_budget=conflict_budget, prop_budget=prop_budget)
             if is_sat:
-                return solver.get_model()
+                self.status = SAT
+                return self.expand_model(solver.get_model())
             else:
+                self.status = UNSAT if is_sat is False else UNKNOWN
                 return None
 
-    def solve_multiple(self, solver_name="glucose3", n_solutions=1):
+    def solve_multiple(self, solver_name="glucose3", n_solutions=1, timeout=None, conflict_budget=None, prop_budget=None,
+                       progress=None, progress_interval=None, checkpoint=None, checkpoint_interval=60.0):
         """
         Solves the SAT problem and returns multiple solutions.
+        If the timeout or a budget runs out, the solutions found so far are returned and self.status is UNKNOWN.
         :param solver_name: Name of the SAT solver to use
         :param n_solutions: Number of solutions to find
+        :param timeout: wall-clock limit in seconds for the whole enumeration, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :param progress: callable receiving enumeration metrics while solutions are found, see iter_solutions()
+        :param progress_interval: minimum number of seconds between two progress reports, None to report every solution
+        :param checkpoint: path of a checkpoint file to save to and resume from, see iter_solutions()
+        :param checkpoint_interval: minimum number of seconds between two checkpoint saves
         :return: List of solutions, where each solution is a list of integers representing the model
          """
+        return list(self.iter_solutions(solver_name=solver_name, n_solutions=n_solutions, timeout=timeout,
+                                        conflict_budget=conflict_budget, prop_budget=prop_budget,
+                                        progress=progress, progress_interval=progress_interval,
+                                        checkpoint=checkpoint, checkpoint_interval=checkpoint_interval))
+
+    def iter_solutions(self, solver_name="glucose3", n_solutions=None, timeout=None, conflict_budget=None, prop_budget=None,
+                       progress=None, progress_interval=None, checkpoint=None, checkpoint_interval=60.0):
+        """
+        Enumerates solutions one at a time, blocking each one before searching for the next.
+        When the generator finishes, self.status is SAT if n_solutions were found,
+        UNSAT if no further solutions exist and UNKNOWN if the timeout or a budget ran out.
+        progress is called with a dict of metrics (see _enumeration_metrics()) after a solution is found, at most once
+        per progress_interval seconds, and every progress_interval seconds while one solver call runs long (the call is
+        briefly interrupted for it), and once more with "done" set when the enumeration ends; print_progress
+        gives periodic log lines. The last metrics are kept in self.progress. If the generator is closed before the
+        enumeration ends (the consumer stops iterating or drops it), progress is not called again and the metrics
+        in self.progress are not marked done.
+        With a checkpoint file, the solutions found so far are saved every checkpoint_interval seconds and when the
+        enumeration ends. If the file already exists, its solutions are yielded first (as their blocking-clause variables,
+        without auxiliary variables), blocked, and the enumeration continues from there; the file must have been written
+        for a model with the same model_hash(). n_solutions counts the resumed solutions.
+        :param solver_name: Name of the SAT solver to use
+        :param n_solutions: Number of solutions to find, None to enumerate all of them
+        :param timeout: wall-clock limit in seconds for the whole enumeration, None for no limit
+        :param conflict_budget: maximum number of conflicts per solver call, None for no limit
+        :param prop_budget: maximum number of propagations per solver call, None for no limit
+        :param progress: callable receiving the metrics dict, None for no reports
+        :param progress_interval: minimum number of seconds between two progress reports, None to report every solution
+        :param checkpoint: path of the checkpoint file, None for no checkpoints
+        :param checkpoint_interval: minimum number of seconds between two checkpoint saves
+        :return: generator of models
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        found = 0
+        blocked = 0  # blocking clauses added to the solver, resumed ones included
+        last = (start, 0)
+        self.progress = None
+        self.status = UNKNOWN  # until the enumeration ends
+        store = None if checkpoint is None else self._open_checkpoint(checkpoint)
+        closed = False
+
+        with self._make_solver(solver_name) as solver:
+
+            def report():
+                nonlocal last
+                self.progress = self._enumeration_metrics(solver, found, blocked, start, last)
+                last = (time.monotonic(), found)
+                progress(self.progress)
+
+            # long solver calls still report every progress_interval seconds
+            heartbeat = None if progress is None or progress_interval is None else (progress_interval, report)
+
+            try:
+                if store is not None:
+                    # solutions of the interrupted run
+                    for model in self._checkpoint_models(store):
+                        if n_solutions is not None and found >= n_solutions:
+                            break
+                        solver.add_clause([-lit for lit in model])
+                        found += 1
+                        blocked += 1
+                        yield self.expand_model(model)
+
+                    if store["status"] == UNSAT and (n_solutions is None or found < n_solutions):
+                        self.status = UNSAT
+                        return
+
+                while n_solutions is None or found < n_solutions:
+                    is_sat = self._solve_limited(solver, deadline=deadline, conflict_budget=conflict_budget,
+                                                 prop_budget=prop_budget, heartbeat=heartbeat)
+                    if not is_sat:
+                        self.status = UNSAT if is_sat is False else UNKNOWN
+                        return
+
+                    model = solver.get_model()
+                    found += 1
+                    solution = self.expand_model(model)
+
+                    # Create a blocking clause to prevent this exact solution from repeating
+                    blocking_clause = [-lit for lit in model if self.is_site_var(self.original_var(abs(lit)))]
+                    solver.add_clause(blocking_clause)
+                    blocked += 1
+
+                    if store is not None:
+                        self._record_solution(store, blocking_clause)
+                        if time.monotonic() - store["saved"] >= checkpoint_interval:
+                            self._save_checkpoint(checkpoint, store)
+
+                    if progress is not None and (progress_interval is None or time.monotonic() - last[0] >= progress_interval):
+                        report()
+
+                    yield solution
+
+                self.status = SAT
+
+            except GeneratorExit:
+                closed = True
+                raise
+
+            finally:
+                if store is not None:
+                    # a finished enumeration stays finished when a shorter one resumes from it
+                    if store["status"] != UNSAT:
+                        store["status"] = self.status
+                    self._save_checkpoint(checkpoint, store)
+                self.progress = self._enumeration_metrics(solver, found, blocked, start, last, done=not closed)
+                if progress is not None and not closed:
+                    progress(self.progress)
+
+    def _enumeration_metrics(self, solver, found, blocked, start, last, done=False):
+        """
+        Collects the metrics of a running enumeration:
+        solutions, elapsed (s), solutions_per_second, seconds_per_solution (mean), recent_solutions_per_second
+        (since the previous report), conflicts and restarts of the solver (None if it does not count them),
+        blocking_clauses (solutions blocked in the solver, including those resumed from a checkpoint),
+        clauses (number of clauses the solver holds), done and status (None while running).
+        """
+        now = time.monotonic()
+        elapsed = now - start
+        stats = solver.accum_stats() or {}
+        return {
+            "solutions": found,
+            "elapsed": elapsed,
+            "solutions_per_second": found / elapsed if elapsed > 0 else 0.0,
+            "seconds_per_solution": elapsed / found if found else None,
+            "recent_solutions_per_second": (found - last[1]) / (now - last[0]) if now > last[0] else 0.0,
+            "conflicts": stats.get("conflicts"),
+            "restarts": stats.get("restarts"),
+            "blocking_clauses": blocked,
+            "clauses": solver.nof_clauses(),
+            "done": done,
+            "status": self.status if done else None,
+        }
+
+    def _make_solver(self, solver_name):
+        """
+        Creates a solver loaded with the hard clauses of the model (simplified, if presolve() was called)
+        and its native at-most constraints.
+        :param solver_name: Name of the SAT solver to use
+        :return: pysat solver, to be used as a context manager
+        """
         from pysat.solvers import Solver
 
-        solutions = []
-        cnf = [clause[:] for clause in self.cnf.clauses]  # Make a copy
+        # copy the clauses so blocking clauses never leak back into the model
+        cnf = [clause[:] for clause in self.solver_clauses()]
+        solver = Solver(name=solver_name, bootstrap_with=cnf)
+        self._load_atmosts(solver, self.solver_atmosts(), self.solver_top_id())
+        return solver
+
+    @staticmethod
+    def _solve_limited(solver, assumptions=(), deadline=None, conflict_budget=None, prop_budget=None, heartbeat=None):
+        """
+        Runs one solver call under an optional deadline and conflict/propagation budgets.
+        The deadline is enforced by interrupting the solver from a timer thread. With a heartbeat, the call is also
+        interrupted every interval seconds to run the callback and then resumed, keeping what the solver has learnt;
+        solvers without limited solving (e.g. CaDiCaL) run the call without heartbeats.
+        :param solver: pysat solver
+        :param assumptions: literals assumed true for this call
+        :param deadline: time.monotonic() value at which the call is interrupted, None for no limit
+        :param conflict_budget: maximum number of conflicts, None for no limit
+        :param prop_budget: maximum number of propagations, None for no limit
+        :param heartbeat: optional (interval, callback) pair, callback() is called while the call runs
+        :return: True if satisfiable, False if unsatisfiable, None if the call was interrupted or ran out of budget
+        """
+        if heartbeat is not None:
+            try:
+                solver.clear_interrupt()
+            except NotImplementedError:
+                heartbeat = None
+
+        if deadline is None and conflict_budget is None and prop_budget is None and heartbeat is None:
+            return solver.solve(assumptions=assumptions)
+
+        if conflict_budget is not None:
+            solver.conf_budget(conflict_budget)
+        if prop_budget is not None:
+            solver.prop_budget(prop_budget)
+
+        if deadline is None and heartbeat is None:
+            return solver.solve_limited(assumptions=assumptions)
+
+        while True:
+            wait = None if deadline is None else deadline - time.monotonic()
+            beat = heartbeat is not None and (wait is None or heartbeat[0] < wait)
+            if beat:
+                wait = heartbeat[0]
+            if wait <= 0:
+                return None
+
+            fired = threading.Event()
 
-        with Solver(name=solver_name, bootstrap_with=cnf) as solver:
-            for _ in range(n_solutions):
-                is_sat = solver.solve()
-                if not is_sat:
-                    break
-                model = solver.get_model()
-                solutions.append(model)
+            def stop():
+                fired.set()
+                solver.interrupt()
 
-                # Create a blocking clause to prevent this exact solution from repeating
-                blocking_clause = [-lit if lit > 0 else -lit for lit in model if abs(lit) in self.var_dict]
-                solver.add_clause(blocking_clause)
+            timer = threading.Timer(wait, stop)
+            timer.start()
+            try:
+                result = solver.solve_limited(assumptions=assumptions, expect_interrupt=True)
+            finally:
+                timer.cancel()
+            solver.clear_interrupt()
 
-        return solutions
+            # only an interrupt of the heartbeat resumes the call; a deadline or an exhausted budget ends it
+            if result is not None or not beat or not fired.is_set():
+                return result
+            heartbeat[1]()
 
     def decode_solution(self, solution, system_output="int"):
         """
@@ -50,24 +278,21 @@ class SolveAndExportMixin:
         :param solution: List of integers representing the SAT solution
         :return: list of true variables in the format (x, y, z, atom_symbol, truth_value)
         """
-        max_original = self.n_x * self.n_y * self.n_z * self.k
-        variables = []
+        entries = [self.var_dict[encoded_var] for encoded_var in solution if self.is_site_var(encoded_var)]
 
-        for encoded_var in solution:
+        if system_output == "int" or not entries:
+            return [(x, y, z, atom_symbol) for x, y, z, atom_symbol in entries]
 
-            if 0 < encoded_var <= max_original and encoded_var in self.var_dict:
-                x, y, z, atom_symbol = self.var_dict[encoded_var]
+        # all positions are converted in one pass
+        int_positions = [(x, y, z) for x, y, z, _ in entries]
+        if system_output == "frac":
+            positions = self.to_frac_array(int_positions).tolist()
+        elif system_output == "cart":
+            positions = self.to_cart_array(int_positions).tolist()
+        else:
+            raise ValueError(f"Unsupported coordinate system {system_output}")
 
-                if system_output == "frac":
-                    x_s, y_s, z_s = self.to_frac(x, y, z, system="int", pos_rounding="int")
-                elif system_output == "cart":
-                    x_s, y_s, z_s = self.to_cart(x, y, z, system="int", pos_rounding="int")
-                elif system_output == "int":
-                    x_s, y_s, z_s = x, y, z
-
-                variables.append((x_s, y_s, z_s, atom_symbol))
-
-        return variables
+        return [(x_s, y_s, z_s, entry[3]) for (x_s, y_s, z_s), entry in zip(positions, entries)]
 
 
     def export_to_ase(self, solution):
@@ -77,6 +302,8 @@ class SolveAndExportMixin:
         :return: ASE Atoms object
         """
 
+        from ase import Atoms
+
         decoded = self.decode_solution(solution, system_output="cart")
         symbols = []
         charges = []
@@ -97,10 +324,45 @@ class SolveAndExportMixin:
             charges.append(ase_charge)
             cart_positions.append([x, y, z])
 
-        atoms = Atoms( symbols = symbols, positions = cart_positions , cell=self.cell, pbc=True)
+        atoms = Atoms( symbols = symbols, positions = cart_positions , cell=self.cell, pbc=True, charges=charges)
         return atoms
 
 
+    def export_to_pymatgen(self, solutions, filename=None):
+        """
+        Exports solutions to pymatgen Structure objects, with ions as oxidation-state-decorated species.
+        The lattice and species objects are built once and shared by the whole batch.
+        :param solutions: list of SAT solutions to export
+        :param filename: optional JSON-lines file receiving one Structure.as_dict() per line
+        :return: list of pymatgen Structure objects
+        """
+        import json
+        from pymatgen.core import Element, Lattice, Species, Structure
+
+        lattice = Lattice(self.cell.array)
+        species = {}
+        structures = []
+
+        for solution in solutions:
+            decoded = self.decode_solution(solution, system_output="frac")
+            for *_, atom_symbol in decoded:
+                if atom_symbol not in species:
+                    if isinstance(atom_symbol, tuple):
+                        species[atom_symbol] = Species(atom_symbol[0], atom_symbol[1])
+                    else:
+                        species[atom_symbol] = Element(atom_symbol)
+
+            structures.append(Structure(lattice, [species[entry[3]] for entry in decoded],
+                                        [entry[:3] for entry in decoded]))
+
+        if filename is not None:
+            with open(filename, "w") as fp:
+                for structure in structures:
+                    fp.write(json.dumps(structure.as_dict()) + "\n")
+
+        return structures
+
+
     def export_to_CIF(self, solution, filename="output.cif"):
         """
         Exports a solved SAT model to a CIF file.
@@ -108,6 +370,8 @@ class SolveAndExportMixin:
         :param filename: Name of the output CIF file
         :return: None
         """
+        from ase.io import write
+
         atoms = self.export_to_ase(solution)
         write(filename, atoms, format='cif')
         print(f"CIF file is saved to {filename}")
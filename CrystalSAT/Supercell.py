@@ -0,0 +1,139 @@
+from itertools import product
+
+
+class SupercellMixin:
+
+    @staticmethod
+    def _replication(reps):
+        """
+        Converts a replication given as an int, three ints or a diagonal 3x3 matrix to (r_x, r_y, r_z).
+        """
+        if isinstance(reps, int):
+            return reps, reps, reps
+
+        reps = [list(row) if hasattr(row, "__len__") else row for row in reps]
+        if all(isinstance(row, list) for row in reps):
+            if any(reps[i][j] for i in range(3) for j in range(3) if i != j):
+                raise ValueError("Only diagonal replication matrices are supported, the supercell grid must tile the unit cell grid.")
+            reps = [reps[i][i] for i in range(3)]
+
+        r_x, r_y, r_z = (int(r) for r in reps)
+        if min(r_x, r_y, r_z) < 1:
+            raise ValueError(f"Replication {reps} must be at least 1 along each axis.")
+        return r_x, r_y, r_z
+
+
+    def make_supercell(self, reps):
+        """
+        Builds an empty model of the supercell: the cell replicated r_x x r_y x r_z times, with the grid
+        (or the candidate sites) replicated with it, and the same species.
+        :param reps: replication as an int, (r_x, r_y, r_z) or a diagonal 3x3 matrix
+        :return: CrystalSAT model of the supercell, without constraints
+        """
+        import numpy as np
+
+        r_x, r_y, r_z = self._replication(reps)
+        a, b, c = self.a * r_x, self.b * r_y, self.c * r_z
+
+        if self.sites is not None:
+            # site i of tile t is site t * n_sites + i of the supercell
+            tiles = np.array(list(product(range(r_x), range(r_y), range(r_z))), dtype=float)
+            sites = (self.sites[None, :, :] + tiles[:, None, :]) / np.array([r_x, r_y, r_z])
+            return type(self).from_sites(sites.reshape(-1, 3), a, b, c, self.alpha, self.beta, self.gamma,
+                                         self.allowed, lazy=self.lazy)
+
+        return type(self)(self.n_x * r_x, self.n_y * r_y, self.n_z * r_z, a, b, c,
+                          self.alpha, self.beta, self.gamma, self.allowed, lazy=self.lazy)
+
+
+    def tile_position(self, x, y, z, tile, reps):
+        """
+        Gets the supercell position of the image of a position in one tile.
+        :param x: x-coordinate (integer)
+        :param y: y-coordinate (integer)
+        :param z: z-coordinate (integer)
+        :param tile: (i, j, l) index of the tile
+        :param reps: replication as in make_supercell()
+        :return: (x, y, z) position of the supercell model
+        """
+        r_x, r_y, r_z = self._replication(reps)
+        i, j, l = tile
+        if self.sites is not None:
+            return ((i * r_y + j) * r_z + l) * self.n_x + x, 0, 0
+        return x + i * self.n_x, y + j * self.n_y, z + l * self.n_z
+
+
+    def tile_solution(self, solution, supercell, reps):
+        """
+        Tiles a solution of this model over a supercell. Distance constraints are periodic, so the tiled
+        structure satisfies them in the supercell as well.
+        :param solution: model of this cell
+        :param supercell: model returned by make_supercell(reps)
+        :param reps: replication as in make_supercell()
+        :return: sorted list of the true site variables of the supercell, usable with its decode_solution(),
+                 export_to_ase() and occupancy()
+        """
+        tiles = list(product(*(range(r) for r in self._replication(reps))))
+        tiled = []
+        for var in solution:
+            if var > 0 and self.is_site_var(var):
+                x, y, z, _ = self.var_dict[var]
+                atom_id = (var - 1) % self.k
+                tiled.extend(supercell.encode_var(*self.tile_position(x, y, z, tile, reps), atom_id) for tile in tiles)
+        return sorted(tiled)
+
+
+    def solve_supercell(self, reps, build, solver_name="glucose3", n_solutions=1, free_positions=None,
+                        free_types=None, max_attempts=1, timeout=None):
+        """
+        Explores orderings and defects in a supercell on top of solutions of this cell. A solution of this cell is
+        tiled over the supercell; the images of the free positions may then take any of the free types or stay empty
+        independently in every tile, while all other positions keep the atoms of the tiled solution. Only the free
+        positions are left to the solver, so the supercell model is far smaller than a direct solve of the supercell.
+        :param reps: replication as an int, (r_x, r_y, r_z) or a diagonal 3x3 matrix
+        :param build: callable build(crystal) adding the constraints (initialise(), bound_atom(), ...) to a model;
+                      it is called on an empty copy of this cell (self.unit) and then on the supercell,
+                      which has r_x * r_y * r_z times the positions; this model itself is left unchanged
+        :param solver_name: Name of the SAT solver to use
+        :param n_solutions: number of supercell solutions to find
+        :param free_positions: (x, y, z) positions of this cell whose images may change, defaults to the occupied ones
+        :param free_types: atom type IDs allowed on the free positions, defaults to the types in the solution of this cell
+        :param max_attempts: number of solutions of this cell to try before giving up
+        :param timeout: wall-clock limit in seconds for each solve, None for no limit
+        :return: list of models of the supercell (self.supercell), empty if none was found
+        """
+        tiles = list(product(*(range(r) for r in self._replication(reps))))
+        self.unit = type(self)(self.n_x, self.n_y, self.n_z, self.a, self.b, self.c, self.alpha, self.beta, self.gamma,
+                               self.allowed, sites=self.sites, lazy=self.lazy)
+        self.supercell = self.make_supercell(reps)
+        build(self.unit)
+
+        tried = False
+        for solution in self.unit.iter_solutions(solver_name=solver_name, n_solutions=max_attempts, timeout=timeout):
+            occupied = {self.unit.var_dict[var][:3]: (var - 1) % self.k
+                        for var in solution if var > 0 and self.unit.is_site_var(var)}
+            tried = True
+            free = set(occupied) if free_positions is None else set(map(tuple, free_positions))
+            types = set(occupied.values()) if free_types is None else set(free_types)
+
+            self.supercell.reset_constraints()
+            domains = {}
+            for position, tile in product(free | set(occupied), tiles):
+                image = self.tile_position(*position, tile, reps)
+                domains[image] = types if position in free else (occupied[position],)
+            self.supercell.restrict_positions(domains, domains)
+
+            for position, atom_id in occupied.items():
+                if position not in free:
+                    for tile in tiles:
+                        self.supercell.force_atom_at_position(*self.tile_position(*position, tile, reps), atom_id)
+            build(self.supercell)
+
+            solutions = self.supercell.solve_multiple(solver_name=solver_name, n_solutions=n_solutions, timeout=timeout)
+            if solutions:
+                self.status = self.supercell.status
+                return solutions
+
+        # otherwise no solution of the unit cell was found
+        self.status = self.supercell.status if tried else self.unit.status
+        return []
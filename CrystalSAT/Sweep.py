@@ -0,0 +1,425 @@
+
+import gc
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
+
+from .SolveAndExport import SAT, UNSAT, UNKNOWN
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pauses the cyclic garbage collector while large batches of clauses are built.
+    Clauses do not form reference cycles, but allocating hundreds of thousands of them triggers many full collections.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class SweepMixin:
+
+    def add_distance_constraint(self, spec):
+        """
+        Adds the clauses of a distance-dependent constraint and remembers how to regenerate them.
+        Binary clauses between two positions are grouped by constraint and by the periodic offset between the
+        positions (by the pair of candidate sites, without a grid), so that update_cell() only touches the groups
+        whose distance crosses one of the constraint's thresholds.
+        Binary clauses already added by another distance constraint or by initialise(), in either literal order,
+        and binary clauses implied by a unit clause are skipped and counted per group in self.dropped_distance.
+        :param spec: tuple (kind, *args), where kind is "pack", "closest_dist", "isolate" or "coordination"
+        :return:
+        """
+        spec_id = len(self.distance_specs)
+        self.distance_specs.append(spec)
+
+        with _gc_paused():
+            kept = self._dedupe_distance_clauses(spec_id, self.distance_constraint_clauses(spec), self.distance_binaries,
+                                                 self._implied_literals(), self.dropped_distance)
+            for key, clause in kept:
+                self.distance_clauses.setdefault(key, []).append(clause)
+            self._append_hard_clauses([list(clause) for _, clause in kept])
+
+
+    def _dedupe_distance_clauses(self, spec_id, clauses, seen, units, dropped, classes=None):
+        """
+        Assigns distance-dependent clauses to their groups, skipping binary clauses that are already in the model
+        (the same pair of literals in either order) or implied by a unit clause.
+        Clauses of coordination constraints are kept together in one group per constraint and only checked
+        against the clauses outside the distance constraints.
+        :param spec_id: index of the constraint in self.distance_specs
+        :param clauses: list of clauses, or a numpy block of shape (m, 2) with one binary clause between two site variables per row
+        :param seen: set of binary clauses already kept, updated in place
+        :param units: literals fixed by unit clauses
+        :param dropped: dict group -> Counter of the skipped "duplicates" and "subsumed" clauses, updated in place
+        :param classes: pair classes (see pair_class()) whose clauses are kept, None to keep all of them
+        :return: list of (group, clause) pairs, clauses as tuples with binary clauses sorted
+        """
+        if hasattr(clauses, "ndim"):
+            # a block of site-variable conflicts: sort the literals, drop implied clauses and work out the
+            # groups in one pass, leaving only the lookups in seen to Python
+            import numpy as np
+
+            block = np.sort(clauses, axis=1)
+            sites = np.sort((np.abs(block) - 1) // self.k, axis=1)
+            pair_classes = self.pair_class(sites[:, 0], sites[:, 1])
+            if classes is not None:
+                selected = np.isin(pair_classes, classes)
+                block, pair_classes = block[selected], pair_classes[selected]
+            if units and len(block):
+                implied = np.isin(block, np.fromiter(units, dtype=block.dtype)).any(axis=1)
+                for pair, count in zip(*np.unique(pair_classes[implied], return_counts=True)):
+                    dropped.setdefault((spec_id, int(pair)), Counter())["subsumed"] += int(count)
+                block, pair_classes = block[~implied], pair_classes[~implied]
+
+            kept = []
+            duplicates = Counter()
+            for clause, pair in zip(map(tuple, block.tolist()), pair_classes.tolist()):
+                if clause in seen or clause in self.binary_clauses:
+                    duplicates[pair] += 1
+                else:
+                    seen.add(clause)
+                    kept.append(((spec_id, pair), clause))
+            for pair, count in duplicates.items():
+                dropped.setdefault((spec_id, pair), Counter())["duplicates"] += count
+            return kept
+
+        kept = []
+        key = ("spec", spec_id)
+        for clause in clauses:
+            clause = tuple(clause)
+            if len(clause) == 2:
+                clause = tuple(sorted(clause))
+                if clause in self.binary_clauses:
+                    dropped.setdefault(key, Counter())["duplicates"] += 1
+                    continue
+                if clause[0] in units or clause[1] in units:
+                    dropped.setdefault(key, Counter())["subsumed"] += 1
+                    continue
+            kept.append((key, clause))
+        return kept
+
+
+    def _implied_literals(self):
+        """
+        Gets the literals fixed by unit clauses that stay in the model when the cell changes.
+        Any clause containing one of them is already satisfied.
+        Clauses are only appended between in-place edits (see cnf_revision), so only the clauses added since
+        the last call are scanned.
+        """
+        clauses = self.grab_hard_clauses()
+        source, scanned, units = self._unit_scan
+        if source != (id(clauses), self.cnf_revision) or scanned > len(clauses):
+            scanned, units = 0, set()
+        units.update(clause[0] for clause in clauses[scanned:] if len(clause) == 1)
+        self._unit_scan = ((id(clauses), self.cnf_revision), len(clauses), units)
+
+        dynamic = {clause[0] for key, group in self.distance_clauses.items() if key[0] == "spec"
+                   for clause in group if len(clause) == 1}
+        return units - dynamic
+
+
+    def _append_hard_clauses(self, clauses):
+        """
+        Appends a batch of clauses to the hard clauses in one step, keeping the variable count of the CNF up to date.
+        :param clauses: list of clauses (lists of literals)
+        :return:
+        """
+        if not clauses:
+            return
+        self.grab_hard_clauses().extend(clauses)
+        self.cnf.nv = max(self.cnf.nv, max(map(abs, chain.from_iterable(clauses))))
+
+
+    def distance_constraint_clauses(self, spec):
+        """
+        Generates the clauses of a distance-dependent constraint for the current cell.
+        :param spec: tuple (kind, *args)
+        :return: list of clauses, or a numpy block of shape (m, 2) of binary clauses
+        """
+        kind, *args = spec
+        if kind == "pack":
+            return self.packing_clauses(*args)
+        elif kind == "closest_dist":
+            return self.closest_dist_clauses(*args)
+        elif kind == "isolate":
+            return self.isolation_clauses(*args)
+        elif kind == "coordination":
+            return self.coordination_clauses(*args)
+        else:
+            raise ValueError(f"Unsupported distance constraint {kind}")
+
+
+    def pair_class(self, site_1, site_2):
+        """
+        Gets the class of pairs of positions whose distance is always the same: on a grid the periodic offset
+        from the first position to the second, otherwise the pair of candidate sites itself.
+        :param site_1: flattened position indices (int or int numpy array)
+        :param site_2: flattened position indices
+        :return: class indices, in range(n_sites) on a grid and range(n_sites ** 2) otherwise
+        """
+        if self.sites is not None:
+            return site_1 * self.n_x + site_2
+        return self._offset_index(site_1, site_2)
+
+
+    def distance_thresholds(self, spec):
+        """
+        Gets the distances at which the clauses of a pairwise distance constraint between two positions change.
+        :param spec: tuple (kind, *args) with kind "pack", "closest_dist" or "isolate"
+        :return: list of distances (Å)
+        """
+        def radius(atom_id):
+            particle = self.inverse_id(atom_id)
+            return self.get_radius(*particle) if isinstance(particle, tuple) else self.get_radius(particle)
+
+        kind, *args = spec
+        if kind == "pack":
+            radii = {radius(atom_id) for atom_id in self.all_types}
+            return sorted({r_1 + r_2 for r_1 in radii for r_2 in radii} | {self.get_max_radius() * 2.0})
+        elif kind == "closest_dist":
+            atom_id1, atom_id2, min_dist = args
+            return [radius(atom_id1) + radius(atom_id2) + min_dist]
+        elif kind == "isolate":
+            _, _, cutoff, tolerance, ball = args
+            return [cutoff + tolerance] if ball else [cutoff - tolerance, cutoff + tolerance]
+        else:
+            raise ValueError(f"Unsupported distance constraint {kind}")
+
+
+    def _distance_signature(self, spec):
+        """
+        Describes every pair class for a distance constraint in the current cell: for pairwise constraints, on which
+        side of each threshold the distance lies, for coordination the number of periodic images within the shell.
+        The clauses of a class only change with the cell if its signature does.
+        :return: int numpy array indexed by pair class
+        """
+        import numpy as np
+
+        kind, *args = spec
+        positions = np.arange(self.n_x * self.n_y * self.n_z)
+        if self.sites is None:
+            sources, targets = np.zeros_like(positions), positions
+        else:
+            sources, targets = positions[:, None], positions[None, :]
+
+        if kind == "coordination":
+            _, _, cutoff, tolerance, _, _, ball = args
+            low = 0.0 if ball else cutoff - tolerance
+            return self.pair_image_counts(sources, targets, low, cutoff + tolerance).ravel()
+
+        distances = self.pair_distances(sources, targets).ravel()[:, None]
+        thresholds = np.array(self.distance_thresholds(spec))[None, :]
+        return (distances < thresholds).sum(axis=1) + (distances <= thresholds).sum(axis=1)
+
+
+    def update_cell(self, a=None, b=None, c=None, alpha=None, beta=None, gamma=None):
+        """
+        Changes the cell parameters and updates the distance-dependent clauses in place.
+        Only the clauses of pair classes whose distance crosses a threshold of a constraint (and the coordination
+        constraints whose shells change) are regenerated, and only the groups whose clauses changed are replaced
+        in the CNF and in the open solver session. All other clauses are kept.
+        Binary clauses are deduplicated again for the new cell, see add_distance_constraint().
+        Soft clauses (see MaxSATMixin) are not updated.
+        :param a: new length of a (Å), None to keep the current value
+        :param b: new length of b (Å), None to keep the current value
+        :param c: new length of c (Å), None to keep the current value
+        :param alpha: new angle alpha (degrees), None to keep the current value
+        :param beta: new angle beta (degrees), None to keep the current value
+        :param gamma: new angle gamma (degrees), None to keep the current value
+        :return: dict with the number of changed groups and of removed and added clauses
+        """
+        before = [self._distance_signature(spec) for spec in self.distance_specs]
+
+        for name, value in (("a", a), ("b", b), ("c", c), ("alpha", alpha), ("beta", beta), ("gamma", gamma)):
+            if value is not None:
+                setattr(self, name, value)
+        self.build_cell()
+
+        crossed = {spec_id: (signature != self._distance_signature(spec)).nonzero()[0]
+                   for spec_id, (spec, signature) in enumerate(zip(self.distance_specs, before))}
+        return self.refresh_distance_constraints(crossed)
+
+
+    def refresh_distance_constraints(self, crossed=None):
+        """
+        Regenerates the distance-dependent clauses and replaces the groups whose clauses changed,
+        in the CNF and in the open solver session.
+        :param crossed: dict spec_id -> pair classes whose clauses may have changed (see update_cell()),
+                        None to regenerate every constraint, e.g. after new types were activated
+        :return: dict with the number of changed groups and of removed and added clauses
+        """
+        import numpy as np
+
+        if crossed is None:
+            whole = set(range(len(self.distance_specs)))
+            classes = None
+        else:
+            whole = {spec_id for spec_id, pairs in crossed.items()
+                     if self.distance_specs[spec_id][0] == "coordination" and len(pairs)}
+            # binary clauses are deduplicated across constraints within a class, so a class is redone for all of them
+            classes = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] +
+                                               [pairs for spec_id, pairs in crossed.items()
+                                                if self.distance_specs[spec_id][0] != "coordination"]))
+
+        def affected(key):
+            if key[0] == "spec":
+                return key[1] in whole
+            return classes is None or key[1] in class_set
+
+        class_set = set() if classes is None else set(classes.tolist())
+        old_groups = {key: group for key, group in self.distance_clauses.items() if affected(key)}
+
+        with _gc_paused():
+            new_groups = {}
+            seen = set(self.distance_binaries)
+            for key, group in old_groups.items():
+                if key[0] != "spec":
+                    seen.difference_update(group)
+            units = self._implied_literals()
+            for key in [key for key in self.dropped_distance if affected(key)]:
+                del self.dropped_distance[key]
+            for spec_id, spec in enumerate(self.distance_specs):
+                if spec_id in whole:
+                    selected = None
+                elif spec[0] != "coordination" and len(class_set):
+                    selected = classes
+                else:
+                    continue
+                for key, clause in self._dedupe_distance_clauses(spec_id, self.distance_constraint_clauses(spec), seen,
+                                                                 units, self.dropped_distance, selected):
+                    new_groups.setdefault(key, []).append(clause)
+            self.distance_binaries = seen
+
+        changed = [key for key in set(old_groups) | set(new_groups)
+                   if sorted(old_groups.get(key, ())) != sorted(new_groups.get(key, ()))]
+
+        removed = Counter()
+        added = []
+        for key in changed:
+            old = Counter(old_groups.get(key, ()))
+            new = Counter(new_groups.get(key, ()))
+            removed += old - new
+            added.extend((new - old).elements())
+
+        stats = {"groups": len(changed), "removed": sum(removed.values()), "added": len(added)}
+
+        # update the CNF in place; only clauses starting with the first literal of a removed clause are looked up
+        clauses = self.grab_hard_clauses()
+        removed = +removed
+        if removed:
+            firsts = {clause[0] for clause in removed}
+            kept = []
+            for clause in clauses:
+                if clause and clause[0] in firsts:
+                    key = tuple(clause)
+                    if removed[key] > 0:
+                        removed[key] -= 1
+                        continue
+                kept.append(clause)
+            clauses[:] = kept
+            self.cnf_revision += 1
+        self._append_hard_clauses([list(clause) for clause in added])
+
+        # update the live solver: retire the selectors of changed groups and guard their new clauses
+        if self.session is not None:
+            for key in changed:
+                old_selector = self.session_selectors.pop(key, None)
+                if old_selector is not None:
+                    self.session.add_clause([old_selector])
+                if new_groups.get(key):
+                    self._guard_group(key, new_groups[key])
+
+        for key in changed:
+            if new_groups.get(key):
+                self.distance_clauses[key] = new_groups[key]
+            else:
+                self.distance_clauses.pop(key, None)
+        return stats
+
+
+    def open_session(self, solver_name="glucose3"):
+        """
+        Opens a solver session that update_cell() keeps in sync with the model.
+        Distance-dependent clauses are added with one selector literal per group (constraint and pair class),
+        so groups can be retired when the cell changes and the number of assumptions follows the number of offsets. Open the session once all other constraints have been added.
+        :param solver_name: Name of the SAT solver to use
+        :return:
+        """
+        from pysat.card import CardEnc
+        from pysat.solvers import Solver
+
+        self.close_session()
+
+        dynamic = Counter(clause for group in self.distance_clauses.values() for clause in group)
+        static = []
+        for clause in self.grab_hard_clauses():
+            key = tuple(clause)
+            if dynamic[key] > 0:
+                dynamic[key] -= 1
+            else:
+                static.append(clause[:])
+
+        self.session = Solver(name=solver_name, bootstrap_with=static)
+        # at-most constraints without native support get their auxiliary variables from the model's pool,
+        # so they never clash with the selectors allocated later
+        if self.session.supports_atmost():
+            self._load_atmosts(self.session, self.atmosts, self.vpool.top)
+        else:
+            for lits, bound in self.atmosts:
+                self.session.append_formula(CardEnc.atmost(lits=lits, bound=bound, encoding=1, vpool=self.vpool).clauses)
+        self.session_selectors = {}
+        for key, group in self.distance_clauses.items():
+            self._guard_group(key, group)
+
+
+    def session_solve(self, timeout=None, conflict_budget=None, prop_budget=None):
+        """
+        Solves the model with the open session, reusing everything the solver has learnt for earlier cells.
+        The outcome is stored in self.status as SAT, UNSAT or UNKNOWN.
+        :param timeout: wall-clock limit in seconds, None for no limit
+        :param conflict_budget: maximum number of conflicts, None for no limit
+        :param prop_budget: maximum number of propagations, None for no limit
+        :return: model if satisfiable, None if unsatisfiable or unknown
+        """
+        if self.session is None:
+            raise ValueError("No solver session is open, call open_session() first.")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        assumptions = [-selector for selector in self.session_selectors.values()]
+        is_sat = self._solve_limited(self.session, assumptions=assumptions, deadline=deadline,
+                                     conflict_budget=conflict_budget, prop_budget=prop_budget)
+        if is_sat:
+            self.status = SAT
+            return self.session.get_model()
+
+        self.status = UNSAT if is_sat is False else UNKNOWN
+        return None
+
+
+    def close_session(self):
+        """
+        Closes the solver session, if one is open.
+        :return:
+        """
+        if self.session is not None:
+            self.session.delete()
+        self.session = None
+        self.session_selectors = {}
+
+
+    def _guard_group(self, key, group):
+        """
+        Adds a group of clauses to the session, each extended with the group's selector literal.
+        The clauses are active while the selector is assumed false.
+        """
+        selector = self.vpool.id()
+        self.session_selectors[key] = selector
+        for clause in group:
+            self.session.add_clause(list(clause) + [selector])
@@ -0,0 +1,131 @@
+import hashlib
+
+
+
+class TotalizerMixin:
+
+    def totalizer(self, lits, cap=None):
+        """
+        Builds a totalizer over the given literals and adds its clauses to the CNF.
+        Output j (0-based) is true if and only if at least j + 1 of the literals are true,
+        so the outputs can be used for both upper and lower bounds.
+        :param lits: list of literals to count
+        :param cap: largest count that needs to be distinguished; counts above cap set all outputs true
+        :return: list of output literals, of length min(len(lits), cap)
+        """
+        if cap is None or cap > len(lits):
+            cap = len(lits)
+
+        if cap <= 0:
+            return []
+
+        return self._totalizer_node(list(lits), cap)
+
+
+    def _totalizer_node(self, lits, cap):
+        """
+        Recursively builds one node of the totalizer tree.
+        :param lits: literals counted by this node
+        :param cap: largest count that needs to be distinguished
+        :return: list of output literals for this node
+        """
+        if len(lits) == 1:
+            return lits
+
+        mid = len(lits) // 2
+        left = self._totalizer_node(lits[:mid], cap)
+        right = self._totalizer_node(lits[mid:], cap)
+
+        size = min(len(left) + len(right), cap)
+        out = [self.vpool.id() for _ in range(size)]
+        self._totalizer_merge(left, right, out, self.cnf)
+
+        return out
+
+
+    def shared_totalizer(self, items, cap, clauses, built):
+        """
+        Builds a totalizer whose nodes are shared between overlapping sets of literals.
+        The tree splits the literals on the bits of their keys, so two sets that contain the same literals
+        within an aligned range of keys (e.g. the neighbors of two nearby positions) get the same node.
+        Node outputs are named in the IDPool by a short hash of their literals, so the same sets always get the same
+        variables without the pool keeping every set.
+        :param items: list of (key, literal) pairs with distinct non-negative integer keys, e.g. position indices
+        :param cap: largest count that needs to be distinguished
+        :param clauses: list receiving the clauses of nodes built for the first time
+        :param built: dict of nodes already built into clauses, shared between calls that should reuse nodes
+        :return: list of output literals; output j is true if and only if at least j + 1 of the literals are true
+        """
+        if cap <= 0 or not items:
+            return []
+        return self._shared_totalizer_node(tuple(sorted(items)), cap, clauses, built)
+
+
+    def _shared_totalizer_node(self, items, cap, clauses, built):
+        """
+        Builds (or reuses) one node of a shared totalizer.
+        :param items: sorted tuple of (key, literal) pairs counted by this node
+        :param cap: largest count that needs to be distinguished
+        :param clauses: list receiving new clauses
+        :param built: dict (items, cap) -> outputs of nodes already built
+        :return: list of output literals for this node
+        """
+        if len(items) == 1:
+            return [items[0][1]]
+
+        cap = min(cap, len(items))
+        node = (items, cap)
+        if node in built:
+            return built[node]
+
+        # split on the highest bit in which the first and last keys differ
+        bit = (items[0][0] ^ items[-1][0]).bit_length() - 1
+        mid = next(i for i, (key, _) in enumerate(items) if key >> bit & 1)
+
+        left = self._shared_totalizer_node(items[:mid], cap, clauses, built)
+        right = self._shared_totalizer_node(items[mid:], cap, clauses, built)
+
+        size = min(len(left) + len(right), cap)
+        name = hashlib.blake2b(repr(items).encode(), digest_size=16).digest()
+        out = [self.vpool.id(("totalizer", name, cap, j)) for j in range(size)]
+        self._totalizer_merge(left, right, out, clauses)
+
+        built[node] = out
+        return out
+
+
+    @staticmethod
+    def _totalizer_merge(left, right, out, clauses):
+        """
+        Adds the clauses linking the outputs of a totalizer node to the outputs of its two children.
+        :param left: outputs of the left child
+        :param right: outputs of the right child
+        :param out: outputs of this node, truncated at the node's cap
+        :param clauses: CNF or list receiving the clauses
+        :return:
+        """
+        size = len(out)
+
+        # upward: left >= i and right >= j implies out >= i + j
+        for i in range(len(left) + 1):
+            for j in range(len(right) + 1):
+                if i + j == 0:
+                    continue
+                clause = [out[min(i + j, size) - 1]]
+                if i > 0:
+                    clause.append(-left[i - 1])
+                if j > 0:
+                    clause.append(-right[j - 1])
+                clauses.append(clause)
+
+        # downward: left < i + 1 and right < j + 1 implies out < i + j + 1
+        for i in range(len(left) + 1):
+            for j in range(len(right) + 1):
+                if i + j + 1 > size:
+                    continue
+                clause = [-out[i + j]]
+                if i < len(left):
+                    clause.append(left[i])
+                if j < len(right):
+                    clause.append(right[j])
+                clauses.append(clause)
@@ -1,2 +1,6 @@
-from .Base import CrystalSAT
-__all__ = ["CrystalSAT"]
+from .Base import CrystalSAT
+from .SolveAndExport import SAT, UNSAT, UNKNOWN, print_progress
+from .Batch import run_batch, run_job, JsonLinesSink
+from .SolutionStore import SolutionStore
+from .Frozen import FrozenModel
+__all__ = ["CrystalSAT", "SAT", "UNSAT", "UNKNOWN", "print_progress", "run_batch", "run_job", "JsonLinesSink", "SolutionStore", "FrozenModel"]